@@ -1,107 +1,649 @@
+import asyncio
+import functools
+import hashlib
+import inspect
+import json
+import logging
 import os
-from typing import Any, Dict
+import re
+import threading
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Final, List, Optional, Tuple
 
 # Ensure 'app' package is importable even if executed in non-package context
 import sys
 from pathlib import Path
 sys.path.append(str(Path(__file__).resolve().parent.parent))
 
-ADK_AVAILABLE = True
 try:
-    from google.adk.agents import Agent  # type: ignore
+    import orjson  # type: ignore
+    _json_loads = orjson.loads
 except Exception:
-    ADK_AVAILABLE = False
-    Agent = object  # placeholder
+    orjson = None
+    _json_loads = json.loads
 
-from app.tools import generate_image_tool, edit_image_tool
+from app.tools import generate_image_tool, edit_image_tool, generate_images_batch_tool, _resolve_abs_path, MAX_BATCH_IMAGES
+from app.cache import TTLCache
+from app.clients import get_async_openai_client
 from app.settings import settings
-try:
-    from openai import OpenAI  # type: ignore
-    OPENAI_AVAILABLE = True
-except Exception:
-    OPENAI_AVAILABLE = False
-from app.prompts import CHAT_NO_ONBOARDING_PROMPT, TITLE_PROMPT_SYSTEM
+from app.prompts import ORCHESTRATOR_INSTRUCTION
+from app.schemas import TaskResponse
+
+logger = logging.getLogger(__name__)
 
 ROOT_AGENT_NAME = "mini_carrot_orchestrator"
-ADK_MODEL = os.getenv("ADK_MODEL", "gemini-2.0-flash-8b")
-
-INSTRUCTION = """
-You receive a single JSON task:
-{
-  "intent": "generate|edit",
-  "object": "...",
-  "style": "photo|anime|illustration",
-  "prompt_en": "...",
-  "image_path": "...?",
-  "mask_path": "...?",
-  "selection_path": "...?",
-  "size": "512x512|1024x1024"
-}
+ADK_MODEL = settings.ADK_MODEL
 
-Rules:
-- If intent == "generate": call generate_image_tool(prompt=prompt_en, size=size).
-- If intent == "edit": call edit_image_tool(image_path=image_path, prompt=prompt_en, mask_path=mask_path, selection_path=selection_path, size=size).
-- ALWAYS return compact JSON ONLY: {"status":"ok","url":"..."} or {"status":"error","detail":"..."}.
-- Do not explain. No prose. No extra fields.
-"""
+# Static system prefix: never interpolate request data here so provider-side
+# prompt caching sees a byte-identical prefix on every call.
+INSTRUCTION: Final[str] = ORCHESTRATOR_INSTRUCTION
 
+# google.adk and openai are heavy imports; both are deferred to first use so a
+# cold worker only pays for what the request actually touches.
 root_agent = None
-if ADK_AVAILABLE:
+_AGENT_LOCK = threading.Lock()
+_AGENT_BUILT = False
+
+
+def _resolve_agent_call(agent: Any) -> Tuple[Optional[Callable[..., Any]], bool, bool]:
+    """Pick the agent's execute method once: (method, is_async, accepts_timeout)."""
+    method = next(
+        (getattr(agent, n) for n in ("invoke", "run", "execute") if callable(getattr(agent, n, None))),
+        None,
+    )
+    if method is None:
+        return None, False, False
+    try:
+        params = inspect.signature(method).parameters
+        takes_timeout = "timeout" in params or any(p.kind is p.VAR_KEYWORD for p in params.values())
+    except (TypeError, ValueError):
+        takes_timeout = False
+    return method, inspect.iscoroutinefunction(method), takes_timeout
+
+
+_AGENT_CALL, _AGENT_CALL_IS_ASYNC, _AGENT_CALL_TAKES_TIMEOUT = None, False, False
+
+
+def _build_root_agent() -> Any:
+    """Construct the ADK agent on first use (thread-safe); None if ADK is unavailable."""
+    global root_agent, _AGENT_BUILT, _AGENT_CALL, _AGENT_CALL_IS_ASYNC, _AGENT_CALL_TAKES_TIMEOUT
+    if _AGENT_BUILT:
+        return root_agent
+    with _AGENT_LOCK:
+        if not _AGENT_BUILT:
+            try:
+                from google.adk.agents import Agent  # type: ignore
+                root_agent = Agent(
+                    name=ROOT_AGENT_NAME,
+                    model=ADK_MODEL,
+                    description="Orchestrator agent for image generation and editing tasks.",
+                    instruction=INSTRUCTION,
+                    tools=[generate_image_tool, edit_image_tool, generate_images_batch_tool],
+                )
+            except Exception:
+                root_agent = None
+            _AGENT_CALL, _AGENT_CALL_IS_ASYNC, _AGENT_CALL_TAKES_TIMEOUT = _resolve_agent_call(root_agent)
+            _AGENT_BUILT = True
+    return root_agent
+
+
+def _openai_client() -> Any:
+    """AsyncOpenAI client for the running event loop; None if the SDK or key is missing."""
+    try:
+        return get_async_openai_client()
+    except (ImportError, ValueError):
+        return None
+
+
+# ---- Provider fallback chain ---------------------------------------------------
+# OpenAI function-calling schemas mirroring the local tools. With strict=True the
+# arguments are produced by constrained decoding, so they always parse and match.
+# The model only picks the call; the tool itself always runs locally.
+OPENAI_TOOLS = [
+    {
+        "type": "function",
+        "function": {
+            "name": "generate_image_tool",
+            "description": "Generate a new image from an English prompt.",
+            "strict": True,
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "prompt": {"type": "string"},
+                    "size": {"type": "string"},
+                },
+                "required": ["prompt", "size"],
+                "additionalProperties": False,
+            },
+        },
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "generate_images_batch_tool",
+            "description": "Generate several images at once, one per prompt.",
+            "strict": True,
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "prompts": {"type": "array", "items": {"type": "string"}},
+                    "size": {"type": "string"},
+                },
+                "required": ["prompts", "size"],
+                "additionalProperties": False,
+            },
+        },
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "edit_image_tool",
+            "description": "Edit an existing image with an English prompt.",
+            "strict": True,
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "image_path": {"type": "string"},
+                    "prompt": {"type": "string"},
+                    "mask_path": {"type": ["string", "null"]},
+                    "selection_path": {"type": ["string", "null"]},
+                    "size": {"type": "string"},
+                },
+                "required": ["image_path", "prompt", "mask_path", "selection_path", "size"],
+                "additionalProperties": False,
+            },
+        },
+    },
+]
+
+LOCAL_TOOLS = {
+    "generate_image_tool": generate_image_tool,
+    "generate_images_batch_tool": generate_images_batch_tool,
+    "edit_image_tool": edit_image_tool,
+}
+
+# Per-provider counters shared by every FallbackStrategy instance; served by /health.
+FALLBACK_STATS: Dict[str, Dict[str, int]] = {}
+
+
+def fallback_stats() -> Dict[str, Dict[str, int]]:
+    """Snapshot of the per-provider fallback counters."""
+    return {name: dict(stats) for name, stats in FALLBACK_STATS.items()}
+
+
+class TaskValidationError(ValueError):
+    """The task itself is malformed; no provider can succeed with it."""
+
+
+class ProviderUnavailable(RuntimeError):
+    """The provider is not configured in this process; skip to the next one."""
+
+
+def _status_code(exc: BaseException) -> Optional[int]:
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        status = getattr(getattr(exc, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def _should_fall_back(exc: BaseException) -> bool:
+    """Whether a failed stage should hand the task to the next provider.
+
+    Timeouts, connection errors and 5xx responses advance the chain. Errors that
+    describe the task itself (malformed JSON, HTTP 400/422) would fail the same
+    way everywhere, so they are surfaced immediately.
+    """
+    if isinstance(exc, TaskValidationError):
+        return False
+    return _status_code(exc) not in (400, 422)
+
+
+# The same task string is parsed by every fallback stage; parse it once and reuse it.
+_TASK_CACHE_MAX_BYTES = 64 * 1024
+
+
+def _loads_task(task_json: str) -> Dict[str, Any]:
     try:
-        root_agent = Agent(
-            name=ROOT_AGENT_NAME,
-            model=ADK_MODEL,
-            description="Orchestrator agent for image generation and editing tasks.",
-            instruction=INSTRUCTION,
-            tools=[generate_image_tool, edit_image_tool],
+        payload = _json_loads(task_json)
+    except ValueError as e:  # orjson.JSONDecodeError subclasses ValueError
+        raise TaskValidationError(f"invalid task json: {e}") from e
+    if not isinstance(payload, dict):
+        raise TaskValidationError("task must be a JSON object")
+    return payload
+
+
+@functools.lru_cache(maxsize=1024)
+def _parse_task_cached(task_json: str) -> Tuple[Tuple[str, Any], ...]:
+    return tuple(_loads_task(task_json).items())
+
+
+def _parse_task(task_json: str) -> Dict[str, Any]:
+    """Parse the task once; identical strings reuse the cached result (fresh dict per call)."""
+    if len(task_json) > _TASK_CACHE_MAX_BYTES:
+        return _loads_task(task_json)
+    return dict(_parse_task_cached(task_json))
+
+
+def _event_text(event: Any) -> Optional[str]:
+    text = getattr(event, "text", None)
+    if text:
+        return text
+    content = getattr(event, "content", None)
+    parts = getattr(content, "parts", None) if content is not None else None
+    if parts:
+        return "".join(t for t in (getattr(p, "text", None) for p in parts) if t) or None
+    return None
+
+
+def _result_from_events(events: Any) -> Any:
+    """Last tool response (or the joined text) from a stream of agent events."""
+    result: Any = None
+    chunks: List[str] = []
+    append = chunks.append
+    for event in events:
+        get_responses = getattr(event, "get_function_responses", None)
+        responses = get_responses() if get_responses is not None else None
+        if responses:
+            # Local tool responses already follow the result contract.
+            for fr in responses:
+                if getattr(fr, "name", None) in LOCAL_TOOLS:
+                    result = dict(getattr(fr, "response", None) or {})
+            continue
+        text = _event_text(event)
+        if text:
+            append(text)
+    # Streamed text arrives in pieces; join once instead of growing a str.
+    return result if result is not None else ("".join(chunks) or None)
+
+
+async def _collect_events(stream: Any) -> List[Any]:
+    return [event async for event in stream]
+
+
+def _normalize_result(res: Any) -> Dict[str, Any]:
+    """Validate an agent result against TaskResponse (drops fields outside the contract)."""
+    if isinstance(res, (list, tuple)) or inspect.isgenerator(res):
+        res = _result_from_events(res)
+    if not isinstance(res, dict):
+        text = getattr(res, "text", None) or (res if isinstance(res, str) else str(res))
+        res = _json_loads(text)
+    return TaskResponse.model_validate(res).model_dump(exclude_none=True)
+
+
+async def adk_invoke(task_json: str, payload: Dict[str, Any], timeout: Optional[float]) -> Dict[str, Any]:
+    if _build_root_agent() is None:
+        raise ProviderUnavailable("ADK agent not initialized")
+    if _AGENT_CALL is None:
+        raise ProviderUnavailable("root_agent has no supported execute method")
+    kwargs = {"timeout": timeout} if _AGENT_CALL_TAKES_TIMEOUT else {}
+    if _AGENT_CALL_IS_ASYNC:
+        res = await asyncio.wait_for(_AGENT_CALL(task_json, **kwargs), timeout=timeout)
+    else:
+        res = await asyncio.wait_for(asyncio.to_thread(_AGENT_CALL, task_json, **kwargs), timeout=timeout)
+    if hasattr(res, "__aiter__"):
+        # Runner-style agents stream events; drain them under the same bound.
+        res = await asyncio.wait_for(_collect_events(res), timeout=timeout)
+    return _normalize_result(res)
+
+
+async def openai_invoke(task_json: str, payload: Dict[str, Any], timeout: Optional[float]) -> Dict[str, Any]:
+    """Let OpenAI pick the tool call; only the planning round-trip is time-bounded."""
+    client = _openai_client()
+    if client is None:
+        raise ProviderUnavailable("OpenAI client not configured")
+    r = await asyncio.wait_for(
+        client.chat.completions.create(
+            model=settings.ROUTER_MODEL,
+            # Stable prefix first, all per-request content in the trailing user turn.
+            messages=[
+                {"role": "system", "content": INSTRUCTION},
+                {"role": "user", "content": task_json},
+            ],
+            tools=OPENAI_TOOLS,
+            tool_choice="required",
+            temperature=0,
+            # Pin routing to the same cache shard; the key is stable per agent.
+            extra_body={"prompt_cache_key": ROOT_AGENT_NAME},
+        ),
+        timeout=timeout,
+    )
+    calls = r.choices[0].message.tool_calls or []
+    if not calls:
+        return _normalize_result(r.choices[0].message.content or "{}")
+    # Calls are addressed by position so the model can chain them as "$0.url".
+    plan = [(str(i), c.function.name, _json_loads(c.function.arguments or "{}")) for i, c in enumerate(calls)]
+    return await run_tool_plan(plan)
+
+
+def submit_tool(tool: Callable[..., Dict[str, Any]], **kwargs: Any) -> "asyncio.Future[Dict[str, Any]]":
+    """Start a blocking tool in the default executor and return its future at once.
+
+    Callers can schedule independent work before awaiting the result.
+    """
+    loop = asyncio.get_running_loop()
+    return loop.run_in_executor(None, functools.partial(tool, **kwargs))
+
+
+# Static per-tool ceilings (seconds). A hung image provider must not block the
+# caller forever; on timeout the worker thread is abandoned, not killed.
+TOOL_TIMEOUTS: Dict[str, float] = {
+    "generate_image_tool": 30.0,
+    "edit_image_tool": 45.0,
+    "generate_images_batch_tool": 90.0,
+}
+_TOOL_TIMEOUT_MAX_FACTOR = 3.0
+_TOOL_LATENCIES: Dict[str, "deque[float]"] = {}
+# Timed-out calls are counted here, never sampled: a hung provider must not
+# widen its own limit.
+_TOOL_TIMEOUT_COUNTS: Dict[str, int] = {}
+
+
+def _percentile(samples: List[float], q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def tool_latency_stats(tool_name: str) -> Dict[str, float]:
+    """p50/p99 of the recent completed calls of one tool, plus its timeout count."""
+    samples = list(_TOOL_LATENCIES.get(tool_name, ()))
+    timeouts = _TOOL_TIMEOUT_COUNTS.get(tool_name, 0)
+    if not samples:
+        return {"timeouts": timeouts} if timeouts else {}
+    return {
+        "n": len(samples),
+        "p50": _percentile(samples, 0.5),
+        "p99": _percentile(samples, 0.99),
+        "timeouts": timeouts,
+    }
+
+
+def tool_timeout(tool_name: str) -> float:
+    """Static limit, widened when the observed p99 drifts above it (capped at 3x)."""
+    base = TOOL_TIMEOUTS.get(tool_name, 30.0)
+    p99 = tool_latency_stats(tool_name).get("p99", 0.0)
+    if p99 > base:
+        return min(p99 * 1.2, base * _TOOL_TIMEOUT_MAX_FACTOR)
+    return base
+
+
+async def run_tool_bounded(tool_name: str, **kwargs: Any) -> Dict[str, Any]:
+    """Run a local tool under ``tool_timeout``; a timeout is an error result, not an exception."""
+    limit = tool_timeout(tool_name)
+    started = time.monotonic()
+    try:
+        res = await asyncio.wait_for(submit_tool(LOCAL_TOOLS[tool_name], **kwargs), timeout=limit)
+    except asyncio.TimeoutError:
+        _TOOL_TIMEOUT_COUNTS[tool_name] = _TOOL_TIMEOUT_COUNTS.get(tool_name, 0) + 1
+        return {"status": "error", "detail": "tool_timeout", "tool": tool_name}
+    _TOOL_LATENCIES.setdefault(tool_name, deque(maxlen=200)).append(time.monotonic() - started)
+    return res
+
+
+# Repeated prompts while iterating hit the image API every time; keep successful
+# results for an hour. Only {"status": "ok"} results are ever stored.
+_IMAGE_CACHE = TTLCache(maxsize=512, ttl=3600)
+
+
+def _file_digest(path: Optional[str]) -> str:
+    abs_path = _resolve_abs_path(path)
+    if not abs_path or not os.path.exists(abs_path):
+        return ""
+    h = hashlib.blake2b(digest_size=16)
+    with open(abs_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _image_cache_key(tool_name: str, kwargs: Dict[str, Any]) -> bytes:
+    parts = [tool_name, (kwargs.get("prompt") or "").strip(), kwargs.get("size") or "1024x1024"]
+    if tool_name == "edit_image_tool":
+        # Different source images (or masks) must never share an entry.
+        parts += [_file_digest(kwargs.get(k)) for k in ("image_path", "mask_path", "selection_path")]
+    return hashlib.blake2b("|".join(parts).encode("utf-8"), digest_size=16).digest()
+
+
+async def run_tool_cached(tool_name: str, **kwargs: Any) -> Dict[str, Any]:
+    """Run a local image tool, serving identical repeats from ``_IMAGE_CACHE``."""
+    if tool_name == "generate_images_batch_tool":
+        # Batches ask for distinct variations; never serve them from the cache.
+        return await run_tool_bounded(tool_name, **kwargs)
+    key = await asyncio.to_thread(_image_cache_key, tool_name, kwargs)
+    hit = _IMAGE_CACHE.get(key)
+    if hit is not None:
+        return dict(hit)
+    res = await run_tool_bounded(tool_name, **kwargs)
+    if isinstance(res, dict) and res.get("status") == "ok" and res.get("url"):
+        _IMAGE_CACHE.set(key, dict(res))
+    return res
+
+
+_PLACEHOLDER_RE = re.compile(r"\$([A-Za-z0-9_\-]+)\.(\w+)")
+
+
+def _plan_deps(args: Dict[str, Any], ids: set) -> set:
+    """Ids of earlier calls whose results ``args`` reference as ``$<id>.<field>``."""
+    deps = set()
+    for value in args.values():
+        if isinstance(value, str):
+            deps.update(m.group(1) for m in _PLACEHOLDER_RE.finditer(value) if m.group(1) in ids)
+    return deps
+
+
+def _fill_placeholders(args: Dict[str, Any], results: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    def sub(m: "re.Match[str]") -> str:
+        res = results.get(m.group(1))
+        return str(res.get(m.group(2), "")) if res else m.group(0)
+
+    return {k: _PLACEHOLDER_RE.sub(sub, v) if isinstance(v, str) else v for k, v in args.items()}
+
+
+async def run_tool_plan(plan: List[Tuple[str, str, Dict[str, Any]]]) -> Dict[str, Any]:
+    """Run the tool calls of one model turn as a dependency DAG.
+
+    Calls with no pending ``$<id>.<field>`` reference run concurrently, so a
+    wave costs max() of its calls instead of sum().
+    """
+    for _, name, _ in plan:
+        if name not in LOCAL_TOOLS:
+            return {"status": "error", "detail": f"Unsupported tool: {name}"}
+    ids = {cid for cid, _, _ in plan}
+    pending = {cid: (name, args, _plan_deps(args, ids - {cid})) for cid, name, args in plan}
+    results: Dict[str, Dict[str, Any]] = {}
+    while pending:
+        wave = [cid for cid, (_, _, deps) in pending.items() if deps <= results.keys()]
+        if not wave:
+            return {"status": "error", "detail": "cyclic tool-call references"}
+        outs = await asyncio.gather(
+            *(run_tool_cached(pending[cid][0], **_fill_placeholders(pending[cid][1], results)) for cid in wave)
         )
-    except Exception:
-        root_agent = None
+        for cid, out in zip(wave, outs):
+            results[cid] = out if isinstance(out, dict) else {"status": "error", "detail": str(out)}
+            del pending[cid]
+    ordered = [results[cid] for cid, _, _ in plan]
+    if len(ordered) == 1:
+        return ordered[0]
+    urls = [u for r in ordered if r.get("status") == "ok" for u in (r.get("urls") or [r.get("url")]) if u]
+    if not urls:
+        return {"status": "error", "detail": "; ".join(str(r.get("detail")) for r in ordered)}
+    errors = [r.get("detail") for r in ordered if r.get("status") != "ok"]
+    out: Dict[str, Any] = {"status": "ok", "url": urls[0], "urls": urls}
+    if errors:
+        out["errors"] = errors
+    return out
 
 
-def adk_run(task_json: str, timeout: float = 25.0) -> Dict[str, Any]:
-    """Run task via ADK if possible; otherwise gracefully fallback.
+def _batch_prompts(payload: Dict[str, Any]) -> List[str]:
+    """Prompts for a multi-image task, or [] for a single image."""
+    prompts = payload.get("prompts") or []
+    if not prompts:
+        count = min(int(payload.get("count") or 1), MAX_BATCH_IMAGES)
+        prompt = payload.get("prompt_en") or payload.get("prompt") or ""
+        prompts = [prompt] * count if count > 1 else []
+    return list(prompts)[:MAX_BATCH_IMAGES]
+
+
+def _tool_call(payload: Dict[str, Any], prompt: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+    """(tool_name, kwargs) for a task per the INSTRUCTION rules; None for unknown intents."""
+    intent = payload.get("intent")
+    size = payload.get("size", "1024x1024")
+    if intent == "generate":
+        batch = _batch_prompts(payload)
+        if batch:
+            return "generate_images_batch_tool", {"prompts": batch, "size": size}
+        return "generate_image_tool", {"prompt": prompt, "size": size}
+    if intent == "edit":
+        return "edit_image_tool", {
+            "image_path": payload.get("image_path"),
+            "prompt": prompt,
+            "mask_path": payload.get("mask_path"),
+            "selection_path": payload.get("selection_path"),
+            "size": size,
+        }
+    return None
+
+
+def _route(payload: Dict[str, Any]) -> Optional[Tuple[str, Dict[str, Any]]]:
+    """Deterministic routing for well-formed tasks; None means the agent must interpret it."""
+    prompt = payload.get("prompt_en")
+    if not isinstance(prompt, str) or not prompt.strip():
+        return None
+    if payload.get("intent") == "edit" and not payload.get("image_path"):
+        return None
+    return _tool_call(payload, prompt)
+
+
+async def local_dispatch(task_json: str, payload: Dict[str, Any], timeout: Optional[float]) -> Dict[str, Any]:
+    """Deterministic dispatch of the JSON task to the local tools."""
+    call = _tool_call(payload, payload.get("prompt_en") or payload.get("prompt") or "")
+    if call is None:
+        return {"status": "error", "detail": f"Unsupported intent: {payload.get('intent')}"}
+    return await run_tool_cached(call[0], **call[1])
+
+
+class FallbackStrategy:
+    """Try each provider in order until one returns a result.
+
+    ``stages`` is an ordered list of ``(name, invoke, timeout_seconds)``. Each
+    stage bounds its own provider round-trip with ``min(timeout_seconds,
+    remaining budget)``; a ``None`` timeout means the stage is unbounded (the
+    local tools carry their own HTTP timeouts).
+    """
+
+    def __init__(self, stages: List[Tuple[str, Callable[..., Awaitable[Dict[str, Any]]], Optional[float]]]):
+        self.stages = stages
+
+    async def run(self, task_json: str, timeout: float) -> Dict[str, Any]:
+        payload = _parse_task(task_json)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        failures: List[str] = []
+        for name, invoke, stage_timeout in self.stages:
+            stats = FALLBACK_STATS.setdefault(name, {"calls": 0, "ok": 0, "errors": 0, "timeouts": 0, "skipped": 0})
+            budget = None
+            if stage_timeout is not None:
+                budget = min(stage_timeout, deadline - loop.time())
+                if budget <= 0:
+                    stats["timeouts"] += 1
+                    failures.append("TimeoutError")
+                    _emit_hop(name, "timeout")
+                    continue
+            stats["calls"] += 1
+            try:
+                res = await invoke(task_json, payload, budget)
+            except ProviderUnavailable:
+                stats["skipped"] += 1
+                failures.append("ProviderUnavailable")
+                _emit_hop(name, "unavailable")
+                continue
+            except asyncio.TimeoutError:
+                stats["timeouts"] += 1
+                failures.append("TimeoutError")
+                _emit_hop(name, "timeout")
+                continue
+            except Exception as e:
+                stats["errors"] += 1
+                if not _should_fall_back(e):
+                    raise
+                failures.append(type(e).__name__)
+                status = _status_code(e)
+                _emit_hop(name, "5xx" if status and status >= 500 else "error", e)
+                continue
+            stats["ok"] += 1
+            _emit_hop(name, "ok")
+            return res
+        # primary: first provider's failure, secondary: the last resort's.
+        return _chain_error(failures[0], failures[-1]) if failures else _chain_error()
+
+
+def _emit_hop(stage: str, outcome: str, exc: Optional[BaseException] = None) -> None:
+    """One structured event per fallback hop, e.g. ``adk_timeout`` / ``openai_5xx`` / ``local_ok``."""
+    if not logger.isEnabledFor(logging.INFO if exc is None else logging.WARNING):
+        return
+    extra = {"event": f"{stage}_{outcome}", "stage": stage, "outcome": outcome}
+    if exc is None:
+        logger.info("%s", extra["event"], extra=extra)
+    else:
+        extra["error_type"] = type(exc).__name__
+        logger.warning("%s", extra["event"], exc_info=exc, extra=extra)
+
+
+def _chain_error(primary: Optional[str] = None, secondary: Optional[str] = None) -> Dict[str, Any]:
+    res: Dict[str, Any] = {"status": "error", "detail": "adk_and_fallback_failed"}
+    if primary:
+        res["primary"] = primary
+    if secondary:
+        res["secondary"] = secondary
+    return res
+
+
+fallback_strategy = FallbackStrategy([
+    ("adk", adk_invoke, 8.0),
+    ("openai", openai_invoke, 12.0),
+    ("local", local_dispatch, None),
+])
+
+
+VALID_INTENTS: Final[frozenset] = frozenset({"generate", "edit"})
+
+
+async def adk_run_async(task_json: str, timeout: float = 25.0) -> Dict[str, Any]:
+    """Run a task: well-formed tasks go straight to the tool via ``_route``; the rest
+    go to ADK, then the OpenAI fallback, then the local tools.
+
+    The direct tool call is bounded by ``max(timeout, tool_timeout(tool))``. In
+    the chain, each provider stage is bounded by ``asyncio.wait_for`` and the
+    whole chain shares the ``timeout`` budget, so it is a real wall-clock cap
+    even when the underlying SDK ignores it. Blocking calls run in worker threads.
 
     Returns a dict like {"status":"ok","url":"..."} or {"status":"error","detail":"..."}
     """
     try:
-        # Try ADK only if available and initialized
-        if ADK_AVAILABLE and root_agent is not None:
-            # Try common method names to execute the agent
-            if hasattr(root_agent, "invoke"):
-                res = root_agent.invoke(task_json, timeout=timeout)
-            elif hasattr(root_agent, "run"):
-                res = root_agent.run(task_json, timeout=timeout)
-            elif hasattr(root_agent, "execute"):
-                res = root_agent.execute(task_json, timeout=timeout)
-            else:
-                raise AttributeError("root_agent has no supported execute method")
-
-            # Normalize response to dict
-            if isinstance(res, dict):
-                return res
-            text = getattr(res, "text", None) or (res if isinstance(res, str) else str(res))
-            import json
-            return json.loads(text)
-    except Exception as e:
-        # Fallback: parse the JSON task and dispatch to local tools
-        try:
-            import json
-            payload = json.loads(task_json)
-            intent = (payload or {}).get("intent")
-            if intent == "generate":
-                return generate_image_tool(
-                    prompt=payload.get("prompt_en") or payload.get("prompt") or "",
-                    size=payload.get("size", "1024x1024"),
-                )
-            if intent == "edit":
-                return edit_image_tool(
-                    image_path=payload.get("image_path"),
-                    prompt=payload.get("prompt_en") or payload.get("prompt") or "",
-                    mask_path=payload.get("mask_path"),
-                    selection_path=payload.get("selection_path"),
-                    size=payload.get("size", "1024x1024"),
-                )
+        payload = _parse_task(task_json)
+        intent = payload.get("intent")
+        if intent not in VALID_INTENTS:
             return {"status": "error", "detail": f"Unsupported intent: {intent}"}
-        except Exception as ee:
-            return {"status": "error", "detail": f"ADK+fallback failed: {str(e) or repr(e)} / {str(ee) or repr(ee)}"}
\ No newline at end of file
+        call = _route(payload)
+        if call is not None:
+            # Well-formed task: the rules are deterministic, so skip the model.
+            # run_tool_bounded already caps the tool itself; never cut it shorter
+            # than that, or a slow batch is abandoned after its images are paid for.
+            try:
+                return await asyncio.wait_for(
+                    run_tool_cached(call[0], **call[1]), max(timeout, tool_timeout(call[0]))
+                )
+            except asyncio.TimeoutError:
+                _emit_hop("direct", "timeout")
+                return _chain_error("timeout")
+        return await fallback_strategy.run(task_json, timeout)
+    except TaskValidationError as e:
+        return {"status": "error", "detail": str(e)}
+    except Exception as e:
+        logger.warning("adk_run failed", exc_info=e)
+        return _chain_error(type(e).__name__)
+
+
+def adk_run(task_json: str, timeout: float = 25.0) -> Dict[str, Any]:
+    """Sync shim around :func:`adk_run_async` for callers without an event loop."""
+    return asyncio.run(adk_run_async(task_json, timeout))
@@ -0,0 +1,48 @@
+import asyncio
+import functools
+from typing import TYPE_CHECKING
+
+from app.settings import settings
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI, OpenAI
+
+# openai SDK는 무거운 import라 각 팩토리의 첫 호출 때 가져옴 (이 모듈을 import하는 것만으로는 로드하지 않음)
+
+
+@functools.lru_cache(maxsize=1)
+def get_chat_client():
+    """설정에 따른 OpenAI/Azure OpenAI 클라이언트 (첫 호출 때 생성, 프로세스 전체가 커넥션 풀 공유)"""
+    if settings.USE_AZURE_OPENAI:
+        from openai import AzureOpenAI
+        return AzureOpenAI(
+            api_key=settings.AZURE_OPENAI_API_KEY,
+            api_version=settings.AZURE_OPENAI_API_VERSION,
+            azure_endpoint=settings.AZURE_OPENAI_ENDPOINT,
+        )
+    from openai import OpenAI
+    return OpenAI(api_key=settings.OPENAI_API_KEY)
+
+
+@functools.lru_cache(maxsize=1)
+def get_openai_client() -> "OpenAI":
+    """Azure 설정과 무관하게 OpenAI를 직접 쓰는 호출용 클라이언트 (키가 없으면 ValueError)"""
+    if not settings.OPENAI_API_KEY:
+        raise ValueError("OPENAI_API_KEY not found in environment variables")
+    from openai import OpenAI
+    return OpenAI(api_key=settings.OPENAI_API_KEY)
+
+
+def get_async_openai_client() -> "AsyncOpenAI":
+    """현재 이벤트 루프용 AsyncOpenAI 클라이언트 (키가 없으면 ValueError)"""
+    return _async_openai_client_for(asyncio.get_running_loop())
+
+
+@functools.lru_cache(maxsize=2)
+def _async_openai_client_for(loop: asyncio.AbstractEventLoop) -> "AsyncOpenAI":
+    # 루프별로 보관: SDK의 httpx 비동기 풀은 처음 사용한 루프에 묶임 (동기 adk_run 심은 호출마다 새 루프)
+    if not settings.OPENAI_API_KEY:
+        raise ValueError("OPENAI_API_KEY not found in environment variables")
+    from openai import AsyncOpenAI
+    # SDK 재시도 없음: 재시도/타임아웃 정책은 호출 측(FallbackStrategy, 라우터의 실패 처리)이 가짐
+    return AsyncOpenAI(api_key=settings.OPENAI_API_KEY, timeout=15.0, max_retries=0)
@@ -1,13 +1,123 @@
+import atexit
+import itertools
+import logging
 import sqlite3
 import os
+import threading
 from typing import Optional
-from datetime import datetime
+
+from app.cache import TTLCache
 
 DATABASE_PATH = os.path.join(os.path.dirname(__file__), "carrot.db")
 
+logger = logging.getLogger(__name__)
+
+# SQL_TRACE=1이면 실제 실행되는 SQL을 DEBUG 로그로 남김 (플랜/호출 빈도 점검용, 기본 꺼짐)
+_SQL_TRACE = os.getenv("SQL_TRACE", "").lower() in ("1", "true", "yes")
+
+# 스레드별 커넥션 재사용 (각 커넥션은 만든 스레드에서만 쓰고, 종료 정리 때만 다른 스레드에서 닫음)
+_local = threading.local()
+_all_conns: list = []
+_all_conns_lock = threading.Lock()
+
+# 쓰기 N회마다 PRAGMA optimize로 통계(sqlite_stat1) 갱신 → 플래너가 인덱스를 안정적으로 선택
+_OPTIMIZE_EVERY = 1000
+_write_counter = itertools.count(1)
+
+# 커넥션마다 1회 적용하는 설정: WAL에서는 NORMAL 동기화로도 손상 없이 커밋 fsync를 줄일 수 있음
+_CONN_PRAGMAS = (
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA temp_store=MEMORY',
+    'PRAGMA mmap_size=268435456',
+    'PRAGMA cache_size=-64000',  # 커넥션당 페이지 캐시 약 64MB
+    'PRAGMA busy_timeout=5000',  # 다른 쓰기와 겹치면 즉시 실패하지 않고 최대 5초 대기
+    'PRAGMA foreign_keys=ON',  # 세션 삭제 시 메시지를 ON DELETE CASCADE로 함께 삭제
+)
+
+# 매 턴 실행되는 SQL은 모듈 상수로 고정 → 호출부가 달라도 같은 문자열이라 cached_statements에서 항상 재사용
+_SQL_UPSERT_USER = (
+    'INSERT INTO users (name) VALUES (?) '
+    'ON CONFLICT(name) DO UPDATE SET last_visit = CURRENT_TIMESTAMP '
+    'RETURNING id, name, created_at, last_visit'
+)
+_SQL_GET_SESSION = (
+    'SELECT id, user_id, title, created_at, updated_at, '
+    'onboarding_greeted, onboarding_asked_once, user_name, summary, summary_upto '
+    'FROM chat_sessions WHERE id = ?'
+)
+_SQL_ADD_MESSAGE = 'INSERT INTO messages (session_id, role, content) VALUES (?, ?, ?)'
+_SQL_ADD_MESSAGE_RETURNING = _SQL_ADD_MESSAGE + ' RETURNING id, created_at'
+_SQL_TOUCH_SESSION = 'UPDATE chat_sessions SET updated_at = CURRENT_TIMESTAMP, title = COALESCE(?, title) WHERE id = ?'
+_SQL_ALL_MESSAGES = (
+    'SELECT id, role, content, created_at FROM messages '
+    'WHERE session_id = ? ORDER BY created_at ASC'
+)
+# 최근 limit개만 SQL에서 잘라 가져온 뒤 시간순으로 뒤집기 (인덱스 순서 그대로라 정렬 없음)
+_SQL_RECENT_MESSAGES = (
+    'SELECT id, role, content, created_at FROM messages '
+    'WHERE session_id = ? ORDER BY created_at DESC, id DESC LIMIT ?'
+)
+
+def _get_conn() -> sqlite3.Connection:
+    """현재 스레드의 공유 커넥션 반환 (없으면 생성, 이전 호출이 남긴 미완료 트랜잭션은 롤백)"""
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        # 헬퍼들의 SQL 문자열은 고정이므로 컴파일된 문장을 넉넉히 캐시해 재파싱 생략
+        conn = sqlite3.connect(DATABASE_PATH, cached_statements=256, check_same_thread=False)
+        # 컬럼 이름으로 접근 (SELECT 컬럼 목록 = 반환 dict 키)
+        conn.row_factory = sqlite3.Row
+        for pragma in _CONN_PRAGMAS:
+            conn.execute(pragma)
+        if _SQL_TRACE:
+            conn.set_trace_callback(lambda sql: logger.debug("SQL: %s", sql))
+        _local.conn = conn
+        with _all_conns_lock:
+            _all_conns.append(conn)
+    elif conn.in_transaction:
+        conn.rollback()
+    return conn
+
+def _note_write(conn: sqlite3.Connection) -> None:
+    """메시지 쓰기 횟수를 세다가 주기적으로 변경된 테이블만 가볍게 ANALYZE"""
+    if next(_write_counter) % _OPTIMIZE_EVERY == 0:
+        conn.execute('PRAGMA optimize')
+
+def _close_all_conns() -> None:
+    """프로세스 종료 시 통계 갱신 후 모든 스레드 커넥션 닫기"""
+    with _all_conns_lock:
+        conns, _all_conns[:] = list(_all_conns), []
+    for conn in conns:
+        try:
+            conn.execute('PRAGMA optimize')
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+atexit.register(_close_all_conns)
+
+# 스키마 버전 (테이블/인덱스/마이그레이션을 바꾸면 올릴 것)
+_SCHEMA_VERSION = 3
+
+# 메시지 테이블 DDL (신규 생성과 CASCADE 마이그레이션의 재구성에서 공유)
+_MESSAGES_TABLE_SQL = '''
+    CREATE TABLE IF NOT EXISTS {name} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        session_id INTEGER NOT NULL,
+        role TEXT NOT NULL,  -- 'user' 또는 'assistant'
+        content TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (session_id) REFERENCES chat_sessions (id) ON DELETE CASCADE
+    )
+'''
+_MESSAGES_INDEX_SQL = 'CREATE INDEX IF NOT EXISTS idx_messages_session_created ON messages(session_id, created_at)'
+
 def init_db():
-    """데이터베이스 초기화 및 테이블 생성"""
-    conn = sqlite3.connect(DATABASE_PATH)
+    """데이터베이스 초기화 및 테이블 생성 (스키마가 최신이면 PRAGMA 1회로 종료)"""
+    conn = _get_conn()
+    if conn.execute('PRAGMA user_version').fetchone()[0] >= _SCHEMA_VERSION:
+        return
+    # WAL은 DB 파일에 영구 기록되므로 초기화 시 1회만 설정 (쓰기 중에도 읽기 가능)
+    conn.execute('PRAGMA journal_mode=WAL')
     cursor = conn.cursor()
     
     # 사용자 테이블 생성
@@ -36,16 +146,11 @@ def init_db():
     ''')
     
     # 메시지 테이블 생성
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS messages (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            session_id INTEGER NOT NULL,
-            role TEXT NOT NULL,  -- 'user' 또는 'assistant'
-            content TEXT NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (session_id) REFERENCES chat_sessions (id)
-        )
-    ''')
+    cursor.execute(_MESSAGES_TABLE_SQL.format(name='messages'))
+    # 세션별 메시지 조회/정렬용 인덱스 (세션 행만 정렬 없이 스캔)
+    cursor.execute(_MESSAGES_INDEX_SQL)
+    # 사용자별 세션 목록(updated_at 내림차순) 조회용 인덱스
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_sessions_user_updated ON chat_sessions(user_id, updated_at DESC)')
     
     # 온보딩 상태 테이블 생성 (세션 이름 기준)
     cursor.execute('''
@@ -58,80 +163,105 @@ def init_db():
             updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         )
     ''')
-    
+
+    # 마이그레이션: 롤링 요약 컬럼 (기존 DB에는 없을 수 있음)
+    columns = {row['name'] for row in cursor.execute('PRAGMA table_info(chat_sessions)')}
+    if 'summary' not in columns:
+        cursor.execute("ALTER TABLE chat_sessions ADD COLUMN summary TEXT DEFAULT ''")
+    # 요약에 이미 반영된 마지막 메시지 id (같은 대화를 요약에 반복해서 합치지 않도록)
+    if 'summary_upto' not in columns:
+        cursor.execute("ALTER TABLE chat_sessions ADD COLUMN summary_upto INTEGER DEFAULT 0")
+
+    # 마이그레이션: messages FK에 ON DELETE CASCADE 추가 (SQLite는 제약 변경이 안 되므로 테이블 재구성)
+    on_delete = {row['table']: row['on_delete'] for row in cursor.execute('PRAGMA foreign_key_list(messages)')}
+    if on_delete.get('chat_sessions') != 'CASCADE':
+        _rebuild_messages_with_cascade(conn)
+
+    # 스키마/인덱스가 바뀐 직후 통계(sqlite_stat1)를 새로 만들어 플래너가 첫 요청부터 인덱스를 고르게 함
+    cursor.execute('ANALYZE')
+    cursor.execute(f'PRAGMA user_version = {_SCHEMA_VERSION}')
     conn.commit()
-    conn.close()
+
+def _rebuild_messages_with_cascade(conn: sqlite3.Connection) -> None:
+    """messages 테이블을 CASCADE FK로 재구성 (이미 지워진 세션의 고아 메시지는 버림)"""
+    conn.commit()
+    # 재구성 중 DROP TABLE이 FK 검사에 걸리지 않도록 잠시 끔 (트랜잭션 밖에서만 적용됨)
+    conn.execute('PRAGMA foreign_keys=OFF')
+    try:
+        conn.executescript(f'''
+            BEGIN;
+            {_MESSAGES_TABLE_SQL.format(name='messages_new')};
+            INSERT INTO messages_new (id, session_id, role, content, created_at)
+                SELECT id, session_id, role, content, created_at FROM messages
+                WHERE session_id IN (SELECT id FROM chat_sessions);
+            -- AUTOINCREMENT 카운터를 넘겨받아 삭제된 메시지 id가 재사용되지 않게 함
+            DELETE FROM sqlite_sequence WHERE name = 'messages_new';
+            UPDATE sqlite_sequence SET name = 'messages_new' WHERE name = 'messages';
+            DROP TABLE messages;
+            ALTER TABLE messages_new RENAME TO messages;
+            {_MESSAGES_INDEX_SQL};
+            COMMIT;
+        ''')
+    finally:
+        conn.execute('PRAGMA foreign_keys=ON')
 
 def get_user_by_name(name: str) -> Optional[dict]:
     """이름으로 사용자 조회"""
-    conn = sqlite3.connect(DATABASE_PATH)
+    conn = _get_conn()
     cursor = conn.cursor()
     
-    cursor.execute('SELECT * FROM users WHERE name = ?', (name,))
+    cursor.execute('SELECT id, name, created_at, last_visit FROM users WHERE name = ?', (name,))
     user = cursor.fetchone()
     
-    conn.close()
-    
-    if user:
-        return {
-            'id': user[0],
-            'name': user[1],
-            'created_at': user[2],
-            'last_visit': user[3]
-        }
-    return None
+    return dict(user) if user else None
+
+# 이름 → 사용자 캐시 (채팅마다 반복되는 사용자 조회를 메모리에서 처리)
+_USER_CACHE = TTLCache(maxsize=4096, ttl=60)
+
+def upsert_user(name: str) -> dict:
+    """사용자 조회+생성(+방문 시간 갱신)을 한 문장으로 처리"""
+    conn = _get_conn()
+    with conn:
+        row = conn.execute(_SQL_UPSERT_USER, (name,)).fetchone()
+    user = dict(row)
+    _USER_CACHE.set(name, user)
+    return user
+
+def ensure_user(name: str) -> dict:
+    """사용자 보장: 캐시에 있으면 그대로, 없으면 upsert 1회로 조회/생성"""
+    return _USER_CACHE.get(name) or upsert_user(name)
 
 def create_user(name: str) -> dict:
     """새 사용자 생성"""
-    conn = sqlite3.connect(DATABASE_PATH)
-    cursor = conn.cursor()
-    
-    cursor.execute('INSERT INTO users (name) VALUES (?)', (name,))
-    user_id = cursor.lastrowid
-    
-    conn.commit()
-    conn.close()
-    
-    return {
-        'id': user_id,
-        'name': name,
-        'created_at': datetime.now().isoformat(),
-        'last_visit': datetime.now().isoformat()
-    }
+    conn = _get_conn()
+    with conn:
+        row = conn.execute('INSERT INTO users (name) VALUES (?) RETURNING id, name, created_at, last_visit',
+                           (name,)).fetchone()
+    
+    user = dict(row)
+    _USER_CACHE.set(name, user)
+    return user
 
 def update_last_visit(name: str):
     """사용자 마지막 방문 시간 업데이트"""
-    conn = sqlite3.connect(DATABASE_PATH)
-    cursor = conn.cursor()
-    
-    cursor.execute('UPDATE users SET last_visit = CURRENT_TIMESTAMP WHERE name = ?', (name,))
-    
-    conn.commit()
-    conn.close()
+    conn = _get_conn()
+    with conn:
+        conn.execute('UPDATE users SET last_visit = CURRENT_TIMESTAMP WHERE name = ?', (name,))
+    _USER_CACHE.pop(name)
 
 # 채팅 세션 관련 함수들
 def create_chat_session(user_id: int, title: str) -> dict:
     """새 채팅 세션 생성"""
-    conn = sqlite3.connect(DATABASE_PATH)
-    cursor = conn.cursor()
+    conn = _get_conn()
+    with conn:
+        row = conn.execute('INSERT INTO chat_sessions (user_id, title) VALUES (?, ?) RETURNING id, created_at, updated_at',
+                           (user_id, title)).fetchone()
     
-    cursor.execute('INSERT INTO chat_sessions (user_id, title) VALUES (?, ?)', (user_id, title))
-    session_id = cursor.lastrowid
-    
-    conn.commit()
-    conn.close()
-    
-    return {
-        'id': session_id,
-        'user_id': user_id,
-        'title': title,
-        'created_at': datetime.now().isoformat(),
-        'updated_at': datetime.now().isoformat()
-    }
+    return dict(row, user_id=user_id, title=title)
 
 def get_chat_sessions_by_user(user_id: int) -> list:
     """사용자의 채팅 세션 목록 조회"""
-    conn = sqlite3.connect(DATABASE_PATH)
+    conn = _get_conn()
     cursor = conn.cursor()
     
     cursor.execute('''
@@ -141,133 +271,172 @@ def get_chat_sessions_by_user(user_id: int) -> list:
         ORDER BY updated_at DESC
     ''', (user_id,))
     
-    sessions = []
-    for row in cursor.fetchall():
-        sessions.append({
-            'id': row[0],
-            'title': row[1],
-            'created_at': row[2],
-            'updated_at': row[3]
-        })
-    
-    conn.close()
-    return sessions
+    return [dict(row) for row in cursor.fetchall()]
+
+def get_user_bundle(name: str, include_messages: bool = False) -> Optional[dict]:
+    """이름으로 사용자 + 세션 목록(+선택 시 세션별 메시지)을 한 번에 조회, 사용자가 없으면 None"""
+    conn = _get_conn()
+    rows = conn.execute('''
+        SELECT u.id AS user_id, s.id, s.title, s.created_at, s.updated_at
+        FROM users u
+        LEFT JOIN chat_sessions s ON s.user_id = u.id
+        WHERE u.name = ?
+        ORDER BY s.updated_at DESC
+    ''', (name,)).fetchall()
+    if not rows:
+        return None
+
+    sessions = [
+        {"id": row['id'], "title": row['title'], "created_at": row['created_at'], "updated_at": row['updated_at']}
+        for row in rows if row['id'] is not None
+    ]
+    if include_messages:
+        by_session = {s['id']: s.setdefault('messages', []) for s in sessions}
+        if by_session:
+            placeholders = ",".join("?" * len(by_session))
+            for row in conn.execute(f'''
+                SELECT session_id, role, content, created_at
+                FROM messages
+                WHERE session_id IN ({placeholders})
+                ORDER BY session_id, created_at ASC
+            ''', tuple(by_session)):
+                by_session[row['session_id']].append(
+                    {"role": row['role'], "content": row['content'], "created_at": row['created_at']}
+                )
+    return {"user_id": rows[0]['user_id'], "sessions": sessions}
 
 def get_chat_session(session_id: int) -> Optional[dict]:
     """특정 채팅 세션 조회"""
-    conn = sqlite3.connect(DATABASE_PATH)
+    conn = _get_conn()
     cursor = conn.cursor()
     
-    cursor.execute('SELECT * FROM chat_sessions WHERE id = ?', (session_id,))
+    cursor.execute(_SQL_GET_SESSION, (session_id,))
     session = cursor.fetchone()
     
-    conn.close()
-    
     if session:
-        return {
-            'id': session[0],
-            'user_id': session[1],
-            'title': session[2],
-            'created_at': session[3],
-            'updated_at': session[4],
-            'onboarding_greeted': bool(session[5]) if len(session) > 5 else False,
-            'onboarding_asked_once': bool(session[6]) if len(session) > 6 else False,
-            'user_name': session[7] if len(session) > 7 else ''
-        }
+        result = dict(session)
+        result['onboarding_greeted'] = bool(result['onboarding_greeted'])
+        result['onboarding_asked_once'] = bool(result['onboarding_asked_once'])
+        result['user_name'] = result['user_name'] or ''
+        result['summary'] = result['summary'] or ''
+        result['summary_upto'] = result['summary_upto'] or 0
+        return result
     return None
 
+# 세션 행 캐시 (매 턴 존재 확인/요약 조회용). 제목·요약 변경과 삭제 시 무효화, updated_at은 갱신하지 않음
+_SESSION_CACHE = TTLCache(maxsize=1024, ttl=30)
+
+def get_chat_session_cached(session_id: int) -> Optional[dict]:
+    """get_chat_session의 TTL 캐시 버전 (없는 세션은 캐시하지 않음)"""
+    session = _SESSION_CACHE.get(session_id)
+    if session is None:
+        session = get_chat_session(session_id)
+        if session is not None:
+            _SESSION_CACHE.set(session_id, session)
+    return session
+
+def _insert_messages(session_id: int, rows: list, title: Optional[str] = None) -> Optional[sqlite3.Row]:
+    """메시지들 INSERT + 세션 갱신 시간(+제목) UPDATE를 한 트랜잭션으로 처리, 단건이면 저장된 (id, created_at) 반환"""
+    conn = _get_conn()
+    with conn:
+        if len(rows) == 1:
+            role, content = rows[0]
+            inserted = conn.execute(_SQL_ADD_MESSAGE_RETURNING, (session_id, role, content)).fetchone()
+        else:
+            conn.executemany(_SQL_ADD_MESSAGE, [(session_id, role, content) for role, content in rows])
+            inserted = None
+        # 세션 업데이트 시간 갱신 (제목이 주어지면 같은 UPDATE에서 함께 설정)
+        conn.execute(_SQL_TOUCH_SESSION, (title, session_id))
+    _note_write(conn)
+    if title is not None:
+        _SESSION_CACHE.pop(session_id)
+    return inserted
+
 def add_message(session_id: int, role: str, content: str) -> dict:
     """메시지 추가"""
-    conn = sqlite3.connect(DATABASE_PATH)
-    cursor = conn.cursor()
-    
-    cursor.execute('INSERT INTO messages (session_id, role, content) VALUES (?, ?, ?)', 
-                   (session_id, role, content))
-    message_id = cursor.lastrowid
-    
-    # 세션 업데이트 시간 갱신
-    cursor.execute('UPDATE chat_sessions SET updated_at = CURRENT_TIMESTAMP WHERE id = ?', (session_id,))
-    
-    conn.commit()
-    conn.close()
-    
-    return {
-        'id': message_id,
-        'session_id': session_id,
-        'role': role,
-        'content': content,
-        'created_at': datetime.now().isoformat()
-    }
+    inserted = _insert_messages(session_id, [(role, content)])
+    return dict(inserted, session_id=session_id, role=role, content=content)
+
+def add_message_and_maybe_title(session_id: int, role: str, content: str, title: Optional[str] = None) -> None:
+    """메시지 추가 + 세션 갱신 시간(+제목)을 한 트랜잭션으로 처리"""
+    _insert_messages(session_id, [(role, content)], title)
+
+def add_messages(session_id: int, rows: list) -> None:
+    """여러 메시지를 한 트랜잭션으로 추가 (rows: [(role, content), ...])"""
+    if rows:
+        _insert_messages(session_id, rows)
 
-def get_messages_by_session(session_id: int) -> list:
-    """세션의 메시지 목록 조회"""
-    conn = sqlite3.connect(DATABASE_PATH)
+def get_messages_by_session(session_id: int, limit: Optional[int] = None) -> list:
+    """세션의 메시지 목록 조회 (limit 지정 시 최근 limit개만, 오래된 순)"""
+    conn = _get_conn()
     cursor = conn.cursor()
     
-    cursor.execute('''
-        SELECT id, role, content, created_at 
-        FROM messages 
-        WHERE session_id = ? 
-        ORDER BY created_at ASC
-    ''', (session_id,))
-    
-    messages = []
-    for row in cursor.fetchall():
-        messages.append({
-            'id': row[0],
-            'role': row[1],
-            'content': row[2],
-            'created_at': row[3]
-        })
+    if limit is None:
+        cursor.execute(_SQL_ALL_MESSAGES, (session_id,))
+        rows = cursor.fetchall()
+    else:
+        cursor.execute(_SQL_RECENT_MESSAGES, (session_id, limit))
+        rows = cursor.fetchall()
+        rows.reverse()
     
-    conn.close()
-    return messages
+    return [dict(row) for row in rows]
+
+def get_last_image_message(session_id: int) -> Optional[str]:
+    """세션의 마지막 어시스턴트 이미지 메시지('[image] URL | ...') 내용, 없으면 None"""
+    conn = _get_conn()
+    row = conn.execute(
+        "SELECT content FROM messages WHERE session_id = ? AND role = 'assistant' AND content LIKE '[image] %' "
+        'ORDER BY created_at DESC, id DESC LIMIT 1',
+        (session_id,),
+    ).fetchone()
+    return row['content'] if row else None
+
+def get_messages_to_summarize(session_id: int, after_id: int, tail: int, limit: int = 100) -> list:
+    """요약 대상 메시지: after_id 이후이면서 최근 tail개 밖으로 밀려난 메시지 (오래된 순, 최대 limit개)"""
+    conn = _get_conn()
+    rows = conn.execute(
+        'SELECT id, role, content FROM messages '
+        'WHERE session_id = ? AND id > ? AND id <= ('
+        '    SELECT id FROM messages WHERE session_id = ? ORDER BY id DESC LIMIT 1 OFFSET ?'
+        ') ORDER BY id ASC LIMIT ?',
+        (session_id, after_id, session_id, tail, limit),
+    ).fetchall()
+    return [dict(row) for row in rows]
+
+def update_session_summary(session_id: int, summary: str, upto: int):
+    """세션 롤링 요약 갱신 (upto: 요약에 반영된 마지막 메시지 id)"""
+    conn = _get_conn()
+    with conn:
+        conn.execute('UPDATE chat_sessions SET summary = ?, summary_upto = ? WHERE id = ?',
+                     (summary, upto, session_id))
+    _SESSION_CACHE.pop(session_id)
 
 def update_session_title(session_id: int, title: str):
     """채팅 세션 제목 업데이트"""
-    conn = sqlite3.connect(DATABASE_PATH)
-    cursor = conn.cursor()
-    
-    cursor.execute('UPDATE chat_sessions SET title = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?', 
-                   (title, session_id))
-    
-    conn.commit()
-    conn.close()
+    conn = _get_conn()
+    with conn:
+        conn.execute('UPDATE chat_sessions SET title = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?',
+                     (title, session_id))
+    _SESSION_CACHE.pop(session_id)
 
 def delete_chat_session(session_id: int):
     """채팅 세션 삭제 (메시지도 함께 삭제)"""
-    conn = sqlite3.connect(DATABASE_PATH)
-    cursor = conn.cursor()
-    
-    # 메시지 먼저 삭제
-    cursor.execute('DELETE FROM messages WHERE session_id = ?', (session_id,))
-    
-    # 세션 삭제
-    cursor.execute('DELETE FROM chat_sessions WHERE id = ?', (session_id,))
-    
-    conn.commit()
-    conn.close()
+    conn = _get_conn()
+    with conn:
+        # 메시지는 FK의 ON DELETE CASCADE로 같은 문장에서 삭제됨
+        conn.execute('DELETE FROM chat_sessions WHERE id = ?', (session_id,))
+    _SESSION_CACHE.pop(session_id)
 
 # 온보딩 상태 관리 함수들
-def get_onboarding_state(session_name: str) -> dict:
-    """세션 이름으로 온보딩 상태 조회"""
-    conn = sqlite3.connect(DATABASE_PATH)
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        SELECT greeted, asked_once, user_name 
-        FROM onboarding_states 
-        WHERE session_name = ?
-    ''', (session_name,))
-    
-    result = cursor.fetchone()
-    conn.close()
-    
-    if result:
+# 세션 이름 → 온보딩 상태 캐시 (매 턴 조회되지만 세션 중 거의 바뀌지 않음). update_onboarding_state가 write-through
+_ONBOARDING_CACHE = TTLCache(maxsize=10000, ttl=600)
+
+def _onboarding_row_to_state(row: Optional[sqlite3.Row]) -> dict:
+    if row:
         return {
-            'greeted': bool(result[0]),
-            'asked_once': bool(result[1]),
-            'user_name': result[2] or ''
+            'greeted': bool(row['greeted']),
+            'asked_once': bool(row['asked_once']),
+            'user_name': row['user_name'] or ''
         }
     return {
         'greeted': False,
@@ -275,52 +444,43 @@ def get_onboarding_state(session_name: str) -> dict:
         'user_name': ''
     }
 
+def get_onboarding_state(session_name: str) -> dict:
+    """세션 이름으로 온보딩 상태 조회 (캐시에 있으면 DB 조회 생략, 호출자에게는 사본 반환)"""
+    state = _ONBOARDING_CACHE.get(session_name)
+    if state is None:
+        conn = _get_conn()
+        row = conn.execute('''
+            SELECT greeted, asked_once, user_name 
+            FROM onboarding_states 
+            WHERE session_name = ?
+        ''', (session_name,)).fetchone()
+        state = _onboarding_row_to_state(row)
+        _ONBOARDING_CACHE.set(session_name, state)
+    return dict(state)
+
 def update_onboarding_state(session_name: str, greeted: bool = None, asked_once: bool = None, user_name: str = None):
-    """온보딩 상태 업데이트"""
-    conn = sqlite3.connect(DATABASE_PATH)
-    cursor = conn.cursor()
-    
-    # 먼저 해당 세션 이름이 있는지 확인
-    cursor.execute('SELECT session_name FROM onboarding_states WHERE session_name = ?', (session_name,))
-    exists = cursor.fetchone()
-    
-    if exists:
-        # 기존 상태 업데이트
-        updates = []
-        params = []
-        
-        if greeted is not None:
-            updates.append('greeted = ?')
-            params.append(greeted)
-        
-        if asked_once is not None:
-            updates.append('asked_once = ?')
-            params.append(asked_once)
-        
-        if user_name is not None:
-            updates.append('user_name = ?')
-            params.append(user_name)
-        
-        if updates:
-            updates.append('updated_at = CURRENT_TIMESTAMP')
-            params.append(session_name)
-            
-            query = f'UPDATE onboarding_states SET {", ".join(updates)} WHERE session_name = ?'
-            cursor.execute(query, params)
-    else:
-        # 새 상태 생성
-        cursor.execute('''
+    """온보딩 상태 업데이트 (없으면 생성, None인 항목은 기존 값 유지) — 저장된 값으로 캐시 갱신"""
+    conn = _get_conn()
+    with conn:
+        row = conn.execute('''
             INSERT INTO onboarding_states (session_name, greeted, asked_once, user_name)
             VALUES (?, ?, ?, ?)
+            ON CONFLICT(session_name) DO UPDATE SET
+                greeted = COALESCE(?, greeted),
+                asked_once = COALESCE(?, asked_once),
+                user_name = COALESCE(?, user_name),
+                updated_at = CURRENT_TIMESTAMP
+            RETURNING greeted, asked_once, user_name
         ''', (
             session_name,
             greeted if greeted is not None else False,
             asked_once if asked_once is not None else False,
-            user_name or ''
-        ))
-    
-    conn.commit()
-    conn.close()
+            user_name or '',
+            greeted,
+            asked_once,
+            user_name,
+        )).fetchone()
+    _ONBOARDING_CACHE.set(session_name, _onboarding_row_to_state(row))
 
 # 앱 시작 시 데이터베이스 초기화
 init_db()
@@ -1,4 +1,6 @@
 import logging
+import os
+import re
 from typing import Optional, Dict, Any
 from fastapi import HTTPException
 from openai import OpenAIError
@@ -26,66 +28,88 @@ class RouterError(ChatServiceError):
     """라우터 관련 에러"""
     pass
 
+# 에러 문구 키워드 (한 번만 컴파일). 사용량 초과가 잘못된 요청보다 우선
+_QUOTA_RE = re.compile(r"quota|rate", re.IGNORECASE)
+_INVALID_RE = re.compile(r"invalid|model", re.IGNORECASE)
+_API_KEY_TYPE_RE = re.compile(r"API|Key")
+_NETWORK_TYPE_RE = re.compile(r"Network|Connection")
+
+# 프로세스 수명 동안 바뀌지 않으므로 import 시점에 한 번만 읽음
+_IS_DEVELOPMENT = os.getenv("ENVIRONMENT") == "development"
+
+
+def _handle_openai_error(e: OpenAIError) -> Dict[str, Any]:
+    """OpenAI API 에러"""
+    text = str(e)
+    if _QUOTA_RE.search(text):
+        return {
+            "reply": "죄송해요, 현재 서비스 사용량이 많아서 일시적으로 사용할 수 없습니다. 잠시 후 다시 시도해주세요.",
+            "error_code": "QUOTA_EXCEEDED"
+        }
+    if _INVALID_RE.search(text):
+        return {
+            "reply": "죄송해요, 이미지 생성에 문제가 발생했습니다. 다른 스타일이나 내용으로 다시 시도해주세요.",
+            "error_code": "INVALID_REQUEST"
+        }
+    return {
+        "reply": "죄송해요, AI 서비스에 일시적인 문제가 발생했습니다. 잠시 후 다시 시도해주세요.",
+        "error_code": "OPENAI_ERROR"
+    }
+
+
+def _handle_service_error(e: ChatServiceError) -> Dict[str, Any]:
+    """커스텀 에러"""
+    return {
+        "reply": e.message,
+        "error_code": e.error_code,
+        "details": e.details
+    }
+
+
+def _handle_generic_error(e: Exception) -> Dict[str, Any]:
+    """일반적인 에러"""
+    # 개발 환경에서는 상세 에러 정보 제공
+    if _IS_DEVELOPMENT:
+        return {
+            "reply": f"개발자용 에러: {str(e)}",
+            "error_code": "DEVELOPMENT_ERROR",
+            "details": {"traceback": traceback.format_exc()}
+        }
+    # 에러 타입에 따른 구체적인 메시지
+    error_type = type(e).__name__
+    if _API_KEY_TYPE_RE.search(error_type):
+        return {
+            "reply": "API 키 설정에 문제가 있습니다. 관리자에게 문의해주세요.",
+            "error_code": "API_KEY_ERROR"
+        }
+    if _NETWORK_TYPE_RE.search(error_type):
+        return {
+            "reply": "네트워크 연결에 문제가 있습니다. 인터넷 연결을 확인해주세요.",
+            "error_code": "NETWORK_ERROR"
+        }
+    return {
+        "reply": f"죄송해요, {error_type} 오류가 발생했습니다. 다시 시도해주세요.",
+        "error_code": "UNKNOWN_ERROR"
+    }
+
+
+# 예외 타입 → 처리 함수 (앞선 항목 우선, 어디에도 해당하지 않으면 일반 에러)
+_HANDLERS = (
+    (OpenAIError, _handle_openai_error),
+    (ChatServiceError, _handle_service_error),
+)
+
+
 def handle_exception(e: Exception, context: str = "unknown") -> Dict[str, Any]:
     """예외를 사용자 친화적 메시지로 변환"""
     
     # 로깅
-    logger.error(f"Error in {context}: {str(e)}", exc_info=True)
-    
-    # OpenAI API 에러
-    if isinstance(e, OpenAIError):
-        if "quota" in str(e).lower() or "rate" in str(e).lower():
-            return {
-                "reply": "죄송해요, 현재 서비스 사용량이 많아서 일시적으로 사용할 수 없습니다. 잠시 후 다시 시도해주세요.",
-                "error_code": "QUOTA_EXCEEDED"
-            }
-        elif "invalid" in str(e).lower() or "model" in str(e).lower():
-            return {
-                "reply": "죄송해요, 이미지 생성에 문제가 발생했습니다. 다른 스타일이나 내용으로 다시 시도해주세요.",
-                "error_code": "INVALID_REQUEST"
-            }
-        else:
-            return {
-                "reply": "죄송해요, AI 서비스에 일시적인 문제가 발생했습니다. 잠시 후 다시 시도해주세요.",
-                "error_code": "OPENAI_ERROR"
-            }
-    
-    # 커스텀 에러
-    elif isinstance(e, ChatServiceError):
-        return {
-            "reply": e.message,
-            "error_code": e.error_code,
-            "details": e.details
-        }
+    logger.error("Error in %s: %s", context, e, exc_info=True)
     
-    # 일반적인 에러
-    else:
-        # 개발 환경에서는 상세 에러 정보 제공
-        import os
-        if os.getenv("ENVIRONMENT") == "development":
-            return {
-                "reply": f"개발자용 에러: {str(e)}",
-                "error_code": "DEVELOPMENT_ERROR",
-                "details": {"traceback": traceback.format_exc()}
-            }
-        else:
-            # 에러 타입에 따른 구체적인 메시지
-            error_type = type(e).__name__
-            if "API" in error_type or "Key" in error_type:
-                return {
-                    "reply": "API 키 설정에 문제가 있습니다. 관리자에게 문의해주세요.",
-                    "error_code": "API_KEY_ERROR"
-                }
-            elif "Network" in error_type or "Connection" in error_type:
-                return {
-                    "reply": "네트워크 연결에 문제가 있습니다. 인터넷 연결을 확인해주세요.",
-                    "error_code": "NETWORK_ERROR"
-                }
-            else:
-                return {
-                    "reply": f"죄송해요, {error_type} 오류가 발생했습니다. 다시 시도해주세요.",
-                    "error_code": "UNKNOWN_ERROR"
-                }
+    for exc_type, handler in _HANDLERS:
+        if isinstance(e, exc_type):
+            return handler(e)
+    return _handle_generic_error(e)
 
 def safe_execute(func, *args, **kwargs):
     """안전한 함수 실행 래퍼"""
@@ -0,0 +1,12 @@
+import atexit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# 모든 툴이 공유하는 HTTP 세션 (keep-alive 커넥션 풀로 TLS 핸드셰이크/DNS 조회 재사용)
+CLIENT = requests.Session()
+_ADAPTER = HTTPAdapter(pool_connections=16, pool_maxsize=32)
+CLIENT.mount("https://", _ADAPTER)
+CLIENT.mount("http://", _ADAPTER)
+
+atexit.register(CLIENT.close)
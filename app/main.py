@@ -1,7 +1,9 @@
+import asyncio
+import json
 import os
 import uuid
 from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Request, Response
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 from app.settings import settings
@@ -12,8 +14,9 @@ from dotenv import load_dotenv
 load_dotenv()  # ← .env 로드 (OPENAI_API_KEY/GOOGLE_API_KEY 확실히 잡음)
 
 # 새로운 아키텍처만 사용
-from app.orchestrator import orchestrate
-from app.database import get_user_by_name, create_user, update_last_visit, get_chat_sessions_by_user, delete_chat_session, get_messages_by_session
+from app.orchestrator import orchestrate, forget_session_history
+from app.adk import fallback_stats
+from app.database import get_user_bundle, upsert_user, delete_chat_session, get_messages_by_session
 import logging
 
 # 새로운 서비스들
@@ -59,6 +62,27 @@ app.mount("/static", StaticFiles(directory=STATIC_DIR), name="static")
 
 INDEX_PATH = os.path.join(BASE_DIR, "ui", "index.html")
 
+# 빈 입력 거절 응답 (본문을 모듈 로드 시 1회 직렬화)
+_EMPTY_MESSAGE_BODY = json.dumps(
+    {"reply": "메시지를 입력해주세요.", "error_code": "EMPTY_MESSAGE"}, ensure_ascii=False
+).encode("utf-8")
+
+def _sse(data: dict) -> str:
+    """SSE data 프레임 한 개 직렬화"""
+    return f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+def _collect_image_files(images: Optional[List[UploadFile]], image: Optional[UploadFile]) -> List[UploadFile]:
+    """단일 이미지 필드가 오면 images 배열에 합치기 (최대 1개)"""
+    image_files = []
+    if images:
+        image_files.extend(images)
+    if image:
+        image_files.append(image)
+    # 업로드 이미지 개수 제한: 최대 1개
+    if len(image_files) > 1:
+        raise HTTPException(status_code=400, detail="이미지는 최대 1개만 업로드할 수 있습니다.")
+    return image_files
+
 class UserNameIn(BaseModel):
     name: str
 
@@ -89,25 +113,21 @@ async def chat_endpoint(
         session_id = body.get("session_id", session_id)
         user_name = body.get("user_name", user_name)
 
+    # 텍스트도 첨부도 없으면 세션/DB를 건드리기 전에 바로 거절
+    if not (message and not message.isspace()) and not (images or image or image_path or selection or mask):
+        return Response(content=_EMPTY_MESSAGE_BODY, status_code=400, media_type="application/json")
+
     # 세션 ID 관리
     sid = get_session_id(request, response, session_id)
-    session = session_manager.get_session(sid)
+    session = await asyncio.to_thread(session_manager.get_session, sid)
     
-    logger.info(f"CHAT_ENDPOINT: sid={sid}, onboarded={session.is_onboarded}, asked_once={session.asked_once}")
+    logger.info("CHAT_ENDPOINT: sid=%s, onboarded=%s, asked_once=%s", sid, session.is_onboarded, session.asked_once)
 
     try:
         # 세션 히스토리 가져오기
-        history = session_manager.get_history(sid)
+        history = await asyncio.to_thread(session_manager.get_history, sid)
         
-        # 단일 이미지 필드가 오면 images 배열에 합치기
-        image_files = []
-        if images:
-            image_files.extend(images)
-        if image:
-            image_files.append(image)
-        # 업로드 이미지 개수 제한: 최대 1개
-        if len(image_files) > 1:
-            raise HTTPException(status_code=400, detail="이미지는 최대 1개만 업로드할 수 있습니다.")
+        image_files = _collect_image_files(images, image)
 
         resp = await orchestrate(
             message=message,
@@ -125,21 +145,89 @@ async def chat_endpoint(
         payload = resp.model_dump()
         # 세션 식별자 포함(프론트에서 세션 고정/목록 로딩에 사용)
         payload.setdefault("session_id", sid)
-        logger.info(f"CHAT_ENDPOINT: response={payload}")
+        # 응답 전체 덤프는 DEBUG에서만 (repr 비용이 매 요청 발생)
+        logger.debug("CHAT_ENDPOINT: response=%s", payload)
         return JSONResponse(payload)
     except Exception as e:
         error_result = handle_exception(e, "chat_endpoint")
         return JSONResponse(error_result, status_code=500)
 
+@app.post("/chat/stream")
+async def chat_stream_endpoint(
+    request: Request,
+    response: Response,
+    message: Optional[str] = Form(None),
+    session_id: str = Form("default"),
+    user_name: str = Form(""),
+    intent: Optional[str] = Form(None),
+    pending_id: Optional[str] = Form(None),
+    images: Optional[List[UploadFile]] = File(None),
+    image: Optional[UploadFile] = File(None),
+    mask: Optional[UploadFile] = File(None),
+    image_path: Optional[str] = Form(None),
+    selection: Optional[UploadFile] = File(None),
+):
+    """/chat의 SSE 버전: 일반 대화 답변은 {"delta"} 프레임으로 바로 흘려보내고, 마지막에 {"done": true, ...} 전체 응답 전송"""
+    if message is None:  # JSON 요청도 허용
+        body = await request.json()
+        message = body.get("message", "")
+        session_id = body.get("session_id", session_id)
+        user_name = body.get("user_name", user_name)
+
+    if not (message and not message.isspace()) and not (images or image or image_path or selection or mask):
+        return Response(content=_EMPTY_MESSAGE_BODY, status_code=400, media_type="application/json")
+
+    sid = get_session_id(request, response, session_id)
+    session = await asyncio.to_thread(session_manager.get_session, sid)
+    image_files = _collect_image_files(images, image)
+
+    history = await asyncio.to_thread(session_manager.get_history, sid)
+
+    deltas: asyncio.Queue = asyncio.Queue()
+    # 저장은 orchestrate 내부에서 백그라운드로 처리되므로 스트림을 막지 않음
+    task = asyncio.create_task(orchestrate(
+        message=message,
+        images=image_files,
+        mask=mask,
+        selection=selection,
+        image_path_str=image_path,
+        session_id=sid,
+        user_name=user_name,
+        history=history,
+        session=session,
+        intent_override=intent,
+        pending_id=pending_id,
+        on_delta=deltas.put_nowait,
+    ))
+
+    async def events():
+        while True:
+            getter = asyncio.ensure_future(deltas.get())
+            done, _ = await asyncio.wait({getter, task}, return_when=asyncio.FIRST_COMPLETED)
+            if getter not in done:
+                getter.cancel()
+                break
+            yield _sse({"delta": getter.result()})
+        while not deltas.empty():
+            yield _sse({"delta": deltas.get_nowait()})
+        try:
+            payload = task.result().model_dump()
+            payload.setdefault("session_id", sid)
+        except Exception as e:
+            payload = handle_exception(e, "chat_stream_endpoint")
+        yield _sse({"done": True, **payload})
+
+    stream = StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+    # get_session_id가 설정한 sid 쿠키 전달
+    stream.raw_headers.extend(h for h in response.raw_headers if h[0] == b"set-cookie")
+    return stream
+
 @app.post("/chat/api/user/save")
 async def save_user(payload: UserNameIn):
     """사용자 정보 저장"""
     try:
-        user = get_user_by_name(payload.name)
-        if not user:
-            user = create_user(payload.name)
-        else:
-            update_last_visit(payload.name)  # name으로 업데이트
+        # 없으면 생성, 있으면 마지막 방문 시간 갱신 (한 문장)
+        user = await asyncio.to_thread(upsert_user, payload.name)
         return {"status": "success", "user_id": user['id']}
     except Exception as e:
         logger.exception("user.save.failed", extra={"name": payload.name})
@@ -149,12 +237,8 @@ async def save_user(payload: UserNameIn):
 async def get_user_sessions(user_name: str):
     """사용자별 채팅 세션 조회"""
     try:
-        user = get_user_by_name(user_name)
-        if not user:
-            return {"sessions": []}
-        
-        sessions = get_chat_sessions_by_user(user['id'])
-        return {"sessions": sessions}
+        bundle = await asyncio.to_thread(get_user_bundle, user_name)
+        return {"sessions": bundle["sessions"] if bundle else []}
     except Exception as e:
         logger.exception("sessions.get.failed", extra={"user_name": user_name})
         raise HTTPException(status_code=500, detail="세션 조회 실패")
@@ -163,7 +247,8 @@ async def get_user_sessions(user_name: str):
 async def delete_session(session_id: int):
     """채팅 세션 삭제"""
     try:
-        delete_chat_session(session_id)
+        await asyncio.to_thread(delete_chat_session, session_id)
+        forget_session_history(session_id)
         return {"status": "success"}
     except Exception as e:
         logger.exception("session.delete.failed", extra={"session_id": session_id})
@@ -173,7 +258,7 @@ async def delete_session(session_id: int):
 async def get_session_messages(session_id: int):
     """특정 세션의 메시지 목록 조회 (사이드바/복원용)"""
     try:
-        msgs = get_messages_by_session(session_id) or []
+        msgs = await asyncio.to_thread(get_messages_by_session, session_id) or []
         return {"messages": msgs}
     except Exception as e:
         logger.exception("session.messages.failed", extra={"session_id": session_id})
@@ -181,8 +266,8 @@ async def get_session_messages(session_id: int):
 
 @app.get("/health")
 async def health():
-    """헬스 체크 엔드포인트"""
-    return {"status": "ok"}
+    """헬스 체크 엔드포인트 (이미지 작업 폴백 단계별 호출/성공/실패 카운터 포함)"""
+    return {"status": "ok", "fallback": fallback_stats()}
 
 @app.get("/")
 async def home():
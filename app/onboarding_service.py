@@ -1,8 +1,9 @@
+import functools
 import logging
 import re
-from typing import Optional, Tuple
+from typing import Any, Callable, Optional, Tuple
 from app.session_manager import SessionContext
-from app.database import add_message, get_onboarding_state, update_onboarding_state
+from app.database import add_messages, get_onboarding_state, update_onboarding_state
 
 logger = logging.getLogger(__name__)
 
@@ -14,68 +15,99 @@ GREETING = (
 
 SHORT_HELLO = "안녕하세요! 무엇을 도와드릴까요? 😊"
 
+# 이름 후보(한글 2~4자)와 짧은 인사 패턴은 모듈 로드 시 한 번만 컴파일
+# (한글 외 문자를 str.translate로 공백 치환 후 split하는 방식보다 findall이 약 2배 빠름 — 비ASCII 문자마다 매핑 조회가 들어가기 때문)
+_KOREAN_NAME_RE = re.compile(r'[가-힣]{2,4}')
+_SHORT_HELLO_RE = re.compile(r"^(안녕|하이|헬로|반가워|안녕하세요)$")
+
+
+# 자기소개 문맥: '저는 X', 'X입니다' 등 (이름 앞/뒤에 붙는 고정 어구)
+_NAME_PREFIXES = ("저는 ", "제 이름은 ", "내 이름은 ")
+_NAME_SUFFIXES = ("입니다", "이에요", "예요")
+_NAME_PREFIX_ALT = "|".join(map(re.escape, _NAME_PREFIXES))
+_NAME_SUFFIX_ALT = "|".join(map(re.escape, _NAME_SUFFIXES))
+
+
+@functools.lru_cache(maxsize=1024)
+def _name_context_re(candidate: str) -> "re.Pattern":
+    """후보 이름의 자기소개 문맥을 한 번에 찾는 패턴 (같은 후보는 캐시 재사용)"""
+    name = re.escape(candidate)
+    return re.compile(f"(?:{_NAME_PREFIX_ALT}){name}|{name}(?:{_NAME_SUFFIX_ALT})")
+
 class OnboardingService:
     """온보딩 서비스 - 단일 진실 소스 (onboarding.py + onboarding_service.py 통합)"""
     
     def __init__(self):
-        self.exclude_keywords = {
+        self.exclude_keywords = frozenset({
             "안녕", "졸려", "피곤", "대화", "생성", "편집", "사진", "이미지",
             "강아지", "고양이", "셰퍼드", "차", "풍경", "만화", "실사",
             "앉아", "서있", "지키", "공원", "거리", "밤", "하루", "오늘",
             "어떤", "무엇", "도와", "필요", "원해", "만들", "그려", "그림"
-        }
+        })
 
     def should_show_greeting(self, session_name: str, history_len: int) -> bool:
-        state = get_onboarding_state(session_name)
-        return history_len == 0 and not state["greeted"]
+        return history_len == 0 and not get_onboarding_state(session_name)["greeted"]
 
     def extract_user_name(self, message: str) -> Optional[str]:
         if not message or len(message.strip()) < 2:
             return None
-        korean_name_pattern = r'[가-힣]{2,4}'
-        matches = re.findall(korean_name_pattern, message)
+        # 순수 ASCII(영문/숫자/URL 등)에는 한글 이름이 있을 수 없음 → C 수준 검사로 정규식 생략
+        if message.isascii():
+            return None
+        matches = _KOREAN_NAME_RE.findall(message)
+        # 후보마다 반복하던 소문자화/공백 제거는 메시지당 한 번만
+        txt = message.lower()
+        stripped = message.strip()
         for match in matches:
-            if match not in self.exclude_keywords and self._is_likely_name(match, message):
-                logger.info(f"Extracted name: {match} from message: {message}")
+            if match not in self.exclude_keywords and self._is_likely_name(match, txt, stripped):
+                logger.info("Extracted name: %s from message: %s", match, message)
                 return match
         return None
 
-    def _is_likely_name(self, candidate: str, message: str) -> bool:
+    def _is_likely_name(self, candidate: str, txt: str, stripped: str) -> bool:
+        """txt: 소문자화된 메시지, stripped: 앞뒤 공백을 제거한 메시지"""
         if len(candidate) < 2 or len(candidate) > 4:
             return False
         if candidate in self.exclude_keywords:
             return False
-        patterns = [
-            f"저는 {candidate}", f"제 이름은 {candidate}", f"내 이름은 {candidate}",
-            f"{candidate}입니다", f"{candidate}이에요", f"{candidate}예요",
-            f"저는 {candidate}입니다", f"제 이름은 {candidate}입니다"
-        ]
-        txt = message.lower()
-        if any(p in txt for p in patterns):
+        if _name_context_re(candidate).search(txt):
             return True
-        if len(message.strip()) <= 4 and candidate == message.strip():
+        if len(stripped) <= 4 and candidate == stripped:
             return True
         return False
 
-    def handle_onboarding(self, message: str, session: SessionContext, history_len: int = 0) -> Tuple[Optional[str], bool]:
+    def _save_name_turn(self, session_id: int, message: str, reply: str) -> None:
+        # DB 라치도 함께 업데이트하여 서버 리로드/재시작 후에도 온보딩이 반복되지 않도록 함
+        try:
+            update_onboarding_state(session_id, greeted=True)
+        except Exception as e:
+            logger.error(f"Failed to update onboarding state: {e}")
+        try:
+            add_messages(session_id, [("user", message), ("assistant", reply)])
+        except Exception as e:
+            logger.error(f"Failed to save onboarding messages: {e}")
+
+    def handle_onboarding(
+        self,
+        message: str,
+        session: SessionContext,
+        history_len: int = 0,
+        persist: Optional[Callable[..., Any]] = None,
+    ) -> Tuple[Optional[str], bool]:
+        """온보딩 응답 결정. persist(func, *args)가 주어지면 DB 저장을 그쪽에 맡겨 응답을 막지 않음"""
         # 이미 온보딩 완료된 경우
         if session.is_onboarded:
             return None, False
 
+        run = persist or (lambda func, *args, **kwargs: func(*args, **kwargs))
+
         # 이름 추출 시도
         extracted_name = self.extract_user_name(message)
         if extracted_name:
+            # 세션(메모리) 상태는 즉시 갱신하고, 저장은 run에 위임
             session.mark_onboarded(extracted_name)
-            # DB 라치도 함께 업데이트하여 서버 리로드/재시작 후에도 온보딩이 반복되지 않도록 함
-            try:
-                update_onboarding_state(session.session_id, greeted=True)
-            except Exception as e:
-                logger.error(f"Failed to update onboarding state: {e}")
-            try:
-                add_message(session.session_id, "user", message)
-                add_message(session.session_id, "assistant", f"안녕하세요, {extracted_name}님! 😊 만나서 반가워요!")
-            except Exception as e:
-                logger.error(f"Failed to save onboarding messages: {e}")
+            run(self._save_name_turn, session.session_id, message,
+                f"안녕하세요, {extracted_name}님! 😊 만나서 반가워요!")
             resp = (
                 f"안녕하세요, {extracted_name}님! 😊 만나서 반가워요!\n"
                 "오늘 어떤 도움이 필요하신가요?\n"
@@ -87,13 +119,14 @@ class OnboardingService:
             )
             return resp, False
 
-        # 첫 메시지에서만 인사 보내고 라치
-        if self.should_show_greeting(session.session_id, history_len):
-            update_onboarding_state(session.session_id, greeted=True)
+        # 첫 메시지에서만 인사 보내고 라치 (세션에 이미 라치돼 있으면 DB 상태 조회 생략)
+        if not session.greeted and self.should_show_greeting(session.session_id, history_len):
+            session.greeted = True
+            run(update_onboarding_state, session.session_id, greeted=True)
             return GREETING, True
 
         # 짧은 인사에는 짧게
-        if re.match(r"^(안녕|하이|헬로|반가워|안녕하세요)$", message.strip()):
+        if _SHORT_HELLO_RE.match(message.strip()):
             return SHORT_HELLO, False
 
         return None, False
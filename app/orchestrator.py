@@ -1,111 +1,242 @@
 # app/orchestrator.py
+import asyncio
+import functools
+import hashlib
+import json
 import logging
+import os
 import re
-from typing import List, Optional, Dict, Any
+import threading
+from typing import Any, Callable, Dict, List, Optional
 from datetime import datetime, timedelta
 from fastapi import UploadFile
 from app.schemas import ChatResponse, GenerationTask, RouterDecision
-from app.router import route_with_llm
-from app.adk import root_agent
+from app.router import route_with_llm, classify_edit_intent
+from app.clients import get_chat_client, get_openai_client
 from app.tools import ensure_saved_file
-from app.tools import edit_image_tool, generate_image_tool
+from app.tools import edit_image_tool, generate_image_tool, warm_image_client
+from app.adk import adk_run_async
+from app.settings import settings
+from app.safety import detect_prohibited
+from app.error_handler import ImageGenerationError
+from app.prompts import (
+    ASK_CLARIFY_SYSTEM_PROMPT,
+    CHAT_NO_ONBOARDING_PROMPT,
+    DEFAULT_EDIT_INSTRUCTION_KR,
+    EDIT_PROMPT_SYSTEM,
+    EDIT_SPEC_SYSTEM,
+    REGENERATE_PROMPT_SYSTEM,
+    SUMMARY_PROMPT_SYSTEM,
+    TITLE_PROMPT_SYSTEM,
+    get_general_chat_response,
+    render_clarify_once,
+    render_image_result,
+)
 
 # 온보딩 모듈 가져오기
 from app.onboarding_service import onboarding_service
+from app.cache import TTLCache
+
+try:
+    import orjson  # type: ignore
+    _json_loads = orjson.loads
+except Exception:
+    orjson = None
+    _json_loads = json.loads
 
 # DB 유틸 가져오기
 from app.database import (
-    get_user_by_name,
-    create_user,
+    ensure_user,
     create_chat_session,
     add_message,
+    add_message_and_maybe_title,
+    add_messages,
     get_messages_by_session,
+    get_last_image_message,
+    get_messages_to_summarize,
+    update_session_summary,
     update_session_title,
     get_chat_session,
+    get_chat_session_cached,
     get_chat_sessions_by_user,
 )
 
 logger = logging.getLogger(__name__)
+
+# fire-and-forget 태스크 참조 보관(GC로 중간 취소 방지)
+_BACKGROUND_TASKS: set = set()
+
+
+def _spawn_background(func, *args, **kwargs) -> "asyncio.Task":
+    """동기 함수를 스레드에서 백그라운드 실행하고, 완료될 때까지 태스크 참조를 유지한다."""
+    task = asyncio.create_task(asyncio.to_thread(func, *args, **kwargs))
+    _BACKGROUND_TASKS.add(task)
+    task.add_done_callback(_BACKGROUND_TASKS.discard)
+    return task
+
+
+def _stream_chat_completion(client, on_chunk: Callable[[str], None], **kwargs) -> str:
+    """chat completion을 스트리밍으로 받아 조각마다 on_chunk 호출 후 전체 텍스트 반환 (워커 스레드에서 실행)"""
+    parts = []
+    for chunk in client.chat.completions.create(stream=True, **kwargs):
+        if not chunk.choices:
+            continue
+        text = chunk.choices[0].delta.content
+        if text:
+            parts.append(text)
+            on_chunk(text)
+    return "".join(parts)
+
+
+# 세션별 최근 대화 캐시: 웜 세션은 매 턴 DB 전체 조회를 생략하고, 저장 시 뒤에 덧붙인다
+# 캐시 적재와 (DB 저장 + 캐시 반영)은 같은 락 안에서: 콜드 적재가 동시 저장을 놓친 채 캐시되는 경합 방지
+_HISTORY_CACHE = TTLCache(maxsize=256, ttl=1800)
+_HISTORY_CACHE_MAX = 64
+_HISTORY_LOCK = threading.RLock()
+
+
+def _cached_history(sid: int) -> List[Dict[str, str]]:
+    """세션 히스토리(role/content)의 복사본 반환, 캐시에 없을 때만 DB 조회"""
+    with _HISTORY_LOCK:
+        hist = _HISTORY_CACHE.get(sid)
+        if hist is None:
+            msgs = get_messages_by_session(sid, limit=_HISTORY_CACHE_MAX) or []
+            hist = [{"role": m['role'], "content": m['content']} for m in msgs]
+            _HISTORY_CACHE.set(sid, hist)
+        return list(hist)
+
+
+def _remember_message(sid: int, role: str, content: str) -> None:
+    """DB 저장 후 캐시된 히스토리에도 반영 (캐시에 없으면 다음 조회 때 DB에서 적재). _HISTORY_LOCK 안에서 호출"""
+    hist = _HISTORY_CACHE.get(sid)
+    if hist is not None:
+        hist.append({"role": role, "content": content})
+        del hist[:-_HISTORY_CACHE_MAX]
+
+
+def forget_session_history(session_id) -> None:
+    """세션 삭제/외부 저장 시 캐시 무효화 (진행 중인 적재가 끝난 뒤 비움)"""
+    try:
+        sid = int(session_id)
+    except (TypeError, ValueError):
+        return
+    with _HISTORY_LOCK:
+        _HISTORY_CACHE.pop(sid)
+
+
 def _save_assistant_text_dedup(session_id: str, text: str):
     """어시스턴트 텍스트 저장 시 직전 동일 메시지면 중복 저장 방지."""
     if not text:
         return
     try:
         sid = int(session_id) if isinstance(session_id, str) else session_id
-        msgs = get_messages_by_session(sid) or []
-        if msgs:
-            last = msgs[-1]
-            if last.get('role') == 'assistant' and (last.get('content') or '').strip() == text.strip():
-                return
-        add_message(sid, role="assistant", content=text)
+        with _HISTORY_LOCK:
+            msgs = _cached_history(sid)
+            if msgs:
+                last = msgs[-1]
+                if last.get('role') == 'assistant' and (last.get('content') or '').strip() == text.strip():
+                    return
+            add_message(sid, role="assistant", content=text)
+            _remember_message(sid, "assistant", text)
     except Exception as e:
-        logger.error(f"Failed to save assistant text (dedup): {e}")
+        logger.error("Failed to save assistant text (dedup): %s", e)
 
 
 
-def _extract_slots_from_message(message: str) -> Dict[str, str]:
-    """사용자 메시지에서 스타일/포즈/배경 정보 추출"""
-    slots = {}
-    message_lower = message.lower()
-    
-    # "몰라", "모르겠어" 등의 응답 처리
-    if any(keyword in message_lower for keyword in ["몰라", "모르", "상관없", "아무", "랜덤", "그냥", "대충"]):
-        # 기본값으로 설정
-        slots["style"] = "illustration"  # 기본 스타일(일러스트)
-        slots["pose"] = "sitting"  # 기본 포즈
-        slots["bg"] = "white background"  # 기본 배경
-        slots["mood"] = "cute"  # 기본 분위기(귀엽고 따뜻한 톤 유도)
-        return slots
-    
-    # 스타일 추출
-    if "실사" in message or "포토" in message or "photo" in message_lower:
-        slots["style"] = "photo"
-    elif "만화" in message or "애니" in message or "anime" in message_lower:
-        slots["style"] = "anime"
-    elif "일러스트" in message or "illustration" in message_lower:
-        slots["style"] = "illustration"
-    
-    # 포즈 추출
-    if "앉아" in message or "sitting" in message_lower:
-        slots["pose"] = "sitting"
-    elif "서있" in message or "standing" in message_lower:
-        slots["pose"] = "standing"
-    elif "지키" in message or "guard" in message_lower:
-        slots["pose"] = "standing guard"
-    
-    # 배경 추출
-    if "공원" in message or "park" in message_lower:
-        slots["bg"] = "park"
-    elif "거리" in message or "street" in message_lower:
-        slots["bg"] = "street"
-    elif "밤" in message or "night" in message_lower:
-        slots["bg"] = "night street"
-    
-    return slots
+# 슬롯 키워드 규칙: 슬롯별로 앞에 있는 값이 우선 (메시지에 여러 값이 있어도 먼저 나열된 값 채택)
+_SLOT_RULES = (
+    ("style", (
+        ("photo", ("실사", "포토", "photo")),
+        ("anime", ("만화", "애니", "anime")),
+        ("illustration", ("일러스트", "illustration")),
+    )),
+    ("pose", (
+        ("sitting", ("앉아", "sitting")),
+        ("standing", ("서있", "standing")),
+        ("standing guard", ("지키", "guard")),
+    )),
+    ("bg", (
+        ("park", ("공원", "park")),
+        ("street", ("거리", "street")),
+        ("night street", ("밤", "night")),
+    )),
+)
+# "몰라", "모르겠어" 등 → 기본값 일괄 적용
+_UNSURE_KEYWORDS = ("몰라", "모르", "상관없", "아무", "랜덤", "그냥", "대충")
+_UNSURE_SLOTS = {
+    "style": "illustration",  # 기본 스타일(일러스트)
+    "pose": "sitting",  # 기본 포즈
+    "bg": "white background",  # 기본 배경
+    "mood": "cute",  # 기본 분위기(귀엽고 따뜻한 톤 유도)
+}
+
+# 키워드 → (슬롯, 값, 우선순위). 슬롯이 None이면 '모르겠음' 응답
+_SLOT_KEYWORDS: Dict[str, tuple] = {
+    **{kw: (None, None, 0) for kw in _UNSURE_KEYWORDS},
+    **{kw: (slot, value, rank)
+       for slot, values in _SLOT_RULES
+       for rank, (value, kws) in enumerate(values)
+       for kw in kws},
+}
+# 모든 키워드를 한 번의 스캔으로 찾는 단일 패턴 (긴 키워드 우선)
+_SLOT_RE = re.compile("|".join(re.escape(kw) for kw in sorted(_SLOT_KEYWORDS, key=len, reverse=True)))
+
+def _extract_slots_from_message(message_lower: str) -> Dict[str, str]:
+    """사용자 메시지(소문자화된)에서 스타일/포즈/배경 정보 추출"""
+    found: Dict[str, tuple] = {}
+    for m in _SLOT_RE.finditer(message_lower):
+        slot, value, rank = _SLOT_KEYWORDS[m.group()]
+        if slot is None:
+            return dict(_UNSURE_SLOTS)
+        if slot not in found or rank < found[slot][1]:
+            found[slot] = (value, rank)
+    return {slot: value for slot, (value, _) in found.items()}
+
+# 객체 키워드 규칙: (키워드, 영문 객체명, 한글 이름, 질문용 형용사). 앞선 규칙이 우선
+_OBJECT_RULES = (
+    (("강아지", "dog"), "dog", "강아지", "귀여운"),
+    (("고양이", "cat"), "cat", "고양이", "귀여운"),
+    (("셰퍼드", "german shepherd"), "German shepherd", "셰퍼드", "멋진"),
+)
+# Clarify 질문에서는 자동차/풍경도 구분
+_CLARIFY_SUBJECT_RULES = _OBJECT_RULES + (
+    (("차", "car"), "car", "자동차", "멋진"),
+    (("풍경", "landscape"), "landscape", "풍경", "아름다운"),
+)
+
+@functools.lru_cache(maxsize=None)
+def _object_matcher(rules: tuple):
+    """규칙 묶음 → (모든 키워드 단일 패턴, 키워드→규칙 순번) — 규칙 묶음마다 한 번만 컴파일"""
+    index = {}
+    for i, (keywords, *_rest) in enumerate(rules):
+        for kw in keywords:
+            index.setdefault(kw, i)
+    pattern = re.compile("|".join(re.escape(kw) for kw in sorted(index, key=len, reverse=True)))
+    return pattern, index
+
+def _detect_object(message_lower: str, rules: tuple = _OBJECT_RULES) -> Optional[tuple]:
+    """소문자화된 메시지에서 객체 감지 → (영문, 한글, 형용사), 없으면 None"""
+    pattern, index = _object_matcher(rules)
+    best = None
+    for m in pattern.finditer(message_lower):
+        i = index[m.group()]
+        if best is None or i < best:
+            best = i
+            if i == 0:
+                break
+    if best is None:
+        return None
+    _, english, korean, adj = rules[best]
+    return english, korean, adj
 
 # ---- Edit (user image) helpers -------------------------------------------------
 def _build_edit_spec(user_text: str) -> Dict[str, Any]:
     """LLM으로 사용자 설명을 JSON 스펙으로 구조화한다(하드코딩 회피)."""
     try:
-        from openai import OpenAI
-        import os, json
-        from app.prompts import EDIT_SPEC_SYSTEM
-        key = os.getenv("OPENAI_API_KEY")
-        if not key:
-            raise RuntimeError("no_openai_key")
-        client = OpenAI(api_key=key)
-        r = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role":"system","content": EDIT_SPEC_SYSTEM},
-                {"role":"user","content": user_text or ""}
-            ],
-            temperature=0.2,
-            max_tokens=280,
-            response_format={"type":"json_object"}
-        )
-        content = r.choices[0].message.content
-        data = json.loads(content)
+        text = (user_text or "").strip()
+        # 짧은 문장은 응답 원문을 캐시해 재시도·반복 요청의 LLM 왕복을 생략 (매번 새로 파싱해 호출자 수정과 분리)
+        content = _edit_spec_content_cached(text) if len(text) <= _EDIT_SPEC_CACHE_MAX_LEN else _edit_spec_content(text)
+        data = _json_loads(content)
         # 수비적 보정
         spec = data.get("spec") or {}
         spec.setdefault("keep", ["캐릭터 스타일","선 두께","구도","조명"])
@@ -132,6 +263,25 @@ def _build_edit_spec(user_text: str) -> Dict[str, Any]:
         }
 
 
+_EDIT_SPEC_CACHE_MAX_LEN = 256
+
+def _edit_spec_content(user_text: str) -> str:
+    r = get_openai_client().chat.completions.create(
+        model="gpt-4o-mini",
+        messages=[
+            {"role":"system","content": EDIT_SPEC_SYSTEM},
+            {"role":"user","content": user_text}
+        ],
+        temperature=0.2,
+        max_tokens=280,
+        response_format={"type":"json_object"}
+    )
+    return r.choices[0].message.content
+
+# 실패는 예외로 빠져나가므로 캐시되지 않는다
+_edit_spec_content_cached = functools.lru_cache(maxsize=1024)(_edit_spec_content)
+
+
 def _compose_edit_prompt(spec: Dict[str, Any]) -> str:
     ops = spec.get("operations") or []
     keep = spec.get("keep") or []
@@ -162,107 +312,126 @@ def _compose_edit_prompt(spec: Dict[str, Any]) -> str:
 def _get_last_image_url(session_id: str) -> Optional[str]:
     try:
         sid = int(session_id) if isinstance(session_id, str) else session_id
-        msgs = get_messages_by_session(sid) or []
-        for m in reversed(msgs):
-            if m.get('role') == 'assistant':
-                content = m.get('content','')
-                if content.startswith('[image] '):
-                    # format: [image] URL | {...}
-                    url = content.split(' ',1)[1].split(' | ',1)[0].strip()
-                    if url:
-                        return url
-        return None
+        # 세션 전체가 아니라 마지막 이미지 행 하나만 조회
+        content = get_last_image_message(sid)
+        if not content:
+            return None
+        # format: [image] URL | {...}
+        url = content.split(' ',1)[1].split(' | ',1)[0].strip()
+        return url or None
     except Exception:
         return None
 
-def _classify_edit_intent(user_text: str) -> bool:
+async def _classify_edit_intent_async(user_text: str) -> bool:
+    """편집 의도 분류를 마감 시간까지만 대기. 초과 시 False — 작업 스레드는 끝까지 돌아 캐시를 채운다"""
     try:
-        from openai import OpenAI, AzureOpenAI
-        from app.prompts import EDIT_INTENT_SYSTEM
-        from app.settings import settings
-        import json
-        client = (
-            AzureOpenAI(api_key=settings.AZURE_OPENAI_API_KEY,
-                        api_version=settings.AZURE_OPENAI_API_VERSION,
-                        azure_endpoint=settings.AZURE_OPENAI_ENDPOINT)
-            if settings.USE_AZURE_OPENAI else OpenAI(api_key=settings.OPENAI_API_KEY)
-        )
-        r = client.chat.completions.create(
-            model=(settings.AZURE_OPENAI_DEPLOYMENT_CHAT if settings.USE_AZURE_OPENAI else settings.ROUTER_MODEL),
-            messages=[{"role":"system","content":EDIT_INTENT_SYSTEM},{"role":"user","content": user_text or ""}],
-            temperature=0,
-            max_tokens=10,
-            response_format={"type":"json_object"}
-        )
-        data = json.loads(r.choices[0].message.content)
-        return bool(data.get('edit') is True)
-    except Exception:
+        return await asyncio.wait_for(asyncio.to_thread(classify_edit_intent, user_text),
+                                      timeout=settings.EDIT_INTENT_TIMEOUT)
+    except asyncio.TimeoutError:
+        logger.info("edit intent classifier timed out after %.1fs", settings.EDIT_INTENT_TIMEOUT)
         return False
 
+# 라우터 결정 캐시: 재전송/재시도처럼 같은 (메시지, 최근 2턴)이면 LLM 왕복 생략 (펜딩이 있으면 캐시하지 않음)
+_ROUTER_CACHE = TTLCache(maxsize=2048, ttl=120)
+
+async def _cached_route(history: List[Dict[str, str]], message: str, pending: Optional[GenerationTask]) -> RouterDecision:
+    """route_with_llm의 TTL 캐시 버전 (호출자가 결정을 수정해도 캐시가 오염되지 않도록 복사본 반환)"""
+    if pending:
+        return await route_with_llm(history, message, pending)
+    tail = "".join(h.get("content") or "" for h in (history or [])[-2:])
+    key = hashlib.blake2b(f"{message}|{tail}".encode("utf-8"), digest_size=16).digest()
+    decision = _ROUTER_CACHE.get(key)
+    if decision is None:
+        decision = await route_with_llm(history, message, None)
+        _ROUTER_CACHE.set(key, decision)
+    return decision.model_copy(deep=True)
+
 
 # ---- Quick intent override rules --------------------------------------------
+# '새/새로/new' 뒤 40자 이내의 '만들/생성'만 인정 — 무제한 .*? 는 '새'가 많고 동사가 없는 긴 입력에서 시작점마다 끝까지 훑어 O(N²)
+# ('새로 만들어'는 첫 갈래에 포함되므로 별도 갈래 불필요)
+_GENERATE_OVERRIDE_RE = re.compile(r"(?:새로?|new)[^\n]{0,40}?(?:만들|생성)|새 이미지")
+# 생성 오버라이드 시 프롬프트에서 지우는 '이 사진/이미지' 지시어
+_IMAGE_REF_RE = re.compile(r"(이 사진|이 이미지|사진|이미지)")
+
 def _wants_generate_override(text: str) -> bool:
     """사용자가 '새로/생성/만들어줘/new' 등을 명시하면 생성으로 강제 전환."""
     if not text:
         return False
-    return bool(re.search(r"(새(로)?|new).*?(만들|생성)|새 이미지|새로 만들어", text))
+    return _GENERATE_OVERRIDE_RE.search(text) is not None
+
+def _apply_slots(task: GenerationTask, message_lower: str) -> GenerationTask:
+    """메시지에서 추출한 스타일/포즈/배경 슬롯을 태스크에 반영"""
+    for key, value in _extract_slots_from_message(message_lower).items():
+        setattr(task, key, value)
+    return task
+
+# 이미 질문한 뒤 강제 실행할 때의 프롬프트 (기본값 보강: 귀엽고 따뜻한 분위기)
+_FORCED_PROMPT_TEMPLATE = "A {style} style {obj} in {bg}, {pose}, cute, warm, cozy, high quality"
+_FORCED_DEFAULTS = {"style": "illustration", "obj": "subject", "bg": "white background", "pose": "natural pose"}
+
+def _forced_prompt(task: GenerationTask) -> str:
+    """빈 슬롯은 기본값으로 채운 강제 실행용 프롬프트"""
+    return _FORCED_PROMPT_TEMPLATE.format(
+        style=task.style or _FORCED_DEFAULTS["style"],
+        obj=task.object or _FORCED_DEFAULTS["obj"],
+        bg=task.bg or _FORCED_DEFAULTS["bg"],
+        pose=task.pose or _FORCED_DEFAULTS["pose"],
+    )
+
+# 분위기 → 공통 보강 어휘 (목록에 없으면 원문 그대로)
+_MOOD_DESC = {
+    "cute": "cute, adorable, whimsical, soft pastel colors, warm, cozy",
+    "brave": "brave, heroic",
+    "calm": "calm, serene",
+    "cool": "cool, stylish",
+}
+_PHOTO_TEMPLATE = (
+    "highly detailed photorealistic photograph of a {obj}, {pose}, in {bg}, "
+    "{mood}, 50mm lens, shallow depth of field, natural lighting, high quality"
+)
+_ANIME_TEMPLATE = (
+    "anime style illustration of a {obj}, {pose}, in {bg}, "
+    "{mood}, cel-shaded, clean bold outlines, large expressive eyes, soft lighting, pastel tones, high quality"
+)
+_ILLUSTRATION_TEMPLATE = (
+    "flat vector illustration of a {obj}, {pose}, in {bg}, "
+    "{mood}, minimal shading, clean lines, simple shapes, vibrant colors, high quality"
+)
+_PENCIL_TEMPLATE = (
+    "pencil sketch of a {obj}, {pose}, in {bg}, {mood}, "
+    "graphite shading, cross-hatching, paper texture, soft strokes, high quality"
+)
+_RENDER_3D_TEMPLATE = (
+    "3D render of a {obj}, {pose}, in {bg}, {mood}, "
+    "soft studio lighting, realistic materials, global illumination, high quality"
+)
+# 스타일(소문자) → 프롬프트 템플릿. 목록에 없으면 사진 템플릿
+_STYLE_TEMPLATES = {
+    "anime": _ANIME_TEMPLATE, "cartoon": _ANIME_TEMPLATE,
+    "illustration": _ILLUSTRATION_TEMPLATE, "illustr": _ILLUSTRATION_TEMPLATE, "vector": _ILLUSTRATION_TEMPLATE,
+    "pencil": _PENCIL_TEMPLATE, "sketch": _PENCIL_TEMPLATE,
+    "3d": _RENDER_3D_TEMPLATE, "3d render": _RENDER_3D_TEMPLATE,
+}
 
 def _build_prompt(task: GenerationTask) -> str:
     """스타일/포즈/배경/분위기를 반영한 영문 프롬프트를 구성한다."""
-    obj = task.object or "subject"
-    pose = task.pose or "standing"
-    bg = task.bg or "plain white background"
     mood = task.mood or "cute"
-    style = (task.style or "illustration").lower()
-
-    # 공통 보강 어휘
-    mood_map = {
-        "cute": "cute, adorable, whimsical, soft pastel colors, warm, cozy",
-        "brave": "brave, heroic",
-        "calm": "calm, serene",
-        "cool": "cool, stylish",
-    }
-    mood_desc = mood_map.get(mood, mood)
-
-    if style in ("anime", "cartoon"):
-        return (
-            f"anime style illustration of a {obj}, {pose}, in {bg}, "
-            f"{mood_desc}, cel-shaded, clean bold outlines, large expressive eyes, soft lighting, pastel tones, high quality"
-        )
-    if style in ("illustration", "illustr", "vector"):
-        return (
-            f"flat vector illustration of a {obj}, {pose}, in {bg}, "
-            f"{mood_desc}, minimal shading, clean lines, simple shapes, vibrant colors, high quality"
-        )
-    if style in ("pencil", "sketch"):
-        return (
-            f"pencil sketch of a {obj}, {pose}, in {bg}, {mood_desc}, "
-            f"graphite shading, cross-hatching, paper texture, soft strokes, high quality"
-        )
-    if style in ("3d", "3d render"):
-        return (
-            f"3D render of a {obj}, {pose}, in {bg}, {mood_desc}, "
-            f"soft studio lighting, realistic materials, global illumination, high quality"
-        )
-    # default: photo
-    return (
-        f"highly detailed photorealistic photograph of a {obj}, {pose}, in {bg}, "
-        f"{mood_desc}, 50mm lens, shallow depth of field, natural lighting, high quality"
+    template = _STYLE_TEMPLATES.get((task.style or "illustration").lower(), _PHOTO_TEMPLATE)
+    return template.format(
+        obj=task.object or "subject",
+        pose=task.pose or "standing",
+        bg=task.bg or "plain white background",
+        mood=_MOOD_DESC.get(mood, mood),
     )
 
-def _fill_defaults(task: GenerationTask, user_msg: str = "") -> GenerationTask:
+def _fill_defaults(task: GenerationTask, message_lower: str = "") -> GenerationTask:
     """부족한 슬롯을 기본값으로 채우기"""
     # 필수 슬롯: object (존재해야 함)
     if not task.object:
         # 객체 추출 시도
-        if "강아지" in user_msg or "dog" in user_msg.lower():
-            task.object = "dog"
-        elif "고양이" in user_msg or "cat" in user_msg.lower():
-            task.object = "cat"
-        elif "셰퍼드" in user_msg or "german shepherd" in user_msg.lower():
-            task.object = "German shepherd"
-        else:
-            task.object = "cute character"  # 기본값
+        detected = _detect_object(message_lower)
+        task.object = detected[0] if detected else "cute character"  # 기본값
     
     # 선택 슬롯들 (없으면 기본값)
     if not task.style:
@@ -283,19 +452,13 @@ def _has_minimum_fields(task: GenerationTask) -> bool:
     """최소 필수 필드가 있는지 확인"""
     return bool(task.object and task.intent in ["generate", "edit"])
 
-def _create_basic_task(message: str) -> GenerationTask:
-    """메시지에서 기본 정보를 추출하여 GenerationTask 생성"""
+def _create_basic_task(message_lower: str) -> GenerationTask:
+    """메시지(소문자화된)에서 기본 정보를 추출하여 GenerationTask 생성"""
     basic_task = GenerationTask(intent="generate")
     
     # 객체 추출
-    if "강아지" in message or "dog" in message.lower():
-        basic_task.object = "dog"
-    elif "고양이" in message or "cat" in message.lower():
-        basic_task.object = "cat"
-    elif "셰퍼드" in message or "german shepherd" in message.lower():
-        basic_task.object = "German shepherd"
-    else:
-        basic_task.object = "subject"
+    detected = _detect_object(message_lower)
+    basic_task.object = detected[0] if detected else "subject"
     
     return basic_task
 
@@ -303,9 +466,7 @@ def _create_basic_task(message: str) -> GenerationTask:
 def _ensure_session_and_history(session_id: Optional[str], user_name: str, history_limit: int = 16):
     """유저/세션 보장 및 히스토리 로드"""
     # 1) 유저 보장
-    user = get_user_by_name(user_name or "anonymous")
-    if not user:
-        user = create_user(user_name or "anonymous")
+    user = ensure_user(user_name or "anonymous")
     
     # 2) 세션 보장
     if not session_id or session_id == "default":
@@ -315,7 +476,7 @@ def _ensure_session_and_history(session_id: Optional[str], user_name: str, histo
     else:
         # 기존 세션 확인
         try:
-            session = get_chat_session(int(session_id))
+            session = get_chat_session_cached(int(session_id))
             if not session:
                 # 세션이 없으면 새로 생성
                 session = create_chat_session(user['id'], "새 대화")
@@ -327,24 +488,67 @@ def _ensure_session_and_history(session_id: Optional[str], user_name: str, histo
     
     # 3) 히스토리 적재(라우터용 포맷)
     try:
-        msgs = get_messages_by_session(int(session_id)) or []
-        hist = [{"role": m['role'], "content": m['content']} for m in msgs[-history_limit:]]
+        hist = [dict(m) for m in _cached_history(int(session_id))[-history_limit:]]
     except Exception as e:
-        logger.warning(f"Failed to load history: {e}")
+        logger.warning("Failed to load history: %s", e)
         hist = []
+    # 최근 tail 앞에 롤링 요약을 붙여 세션 길이와 무관하게 컨텍스트 크기 고정
+    summary = (session or {}).get('summary')
+    if summary:
+        hist.insert(0, {"role": "summary", "content": summary})
     
     return session_id, hist
 
+# 롤링 요약: 사용자 턴 _SUMMARY_EVERY회마다 tail 밖으로 밀려난 대화를 요약에 합친다
+_SUMMARY_EVERY = 20
+_SUMMARY_TURNS = TTLCache(maxsize=1024, ttl=6 * 3600)
+
+def _summary_due(session_id: str) -> bool:
+    """사용자 턴 카운트 증가, 요약 갱신 시점이면 True"""
+    turns = _SUMMARY_TURNS.get(session_id, 0) + 1
+    _SUMMARY_TURNS.set(session_id, turns % _SUMMARY_EVERY)
+    return turns >= _SUMMARY_EVERY
+
+def _refresh_session_summary(session_id: str, tail: int = 16):
+    """지난 요약 이후 tail 밖으로 밀려난 대화만 기존 요약에 합쳐 저장 (백그라운드)"""
+    try:
+        sid = int(session_id)
+        session = get_chat_session(sid)
+        if not session:
+            return
+        older = get_messages_to_summarize(sid, session['summary_upto'], tail)
+        if not older:
+            return
+        convo = "\n".join(f"{m['role']}: {m['content']}" for m in older)
+        previous = session['summary']
+        client = get_chat_client()
+        r = client.chat.completions.create(
+            model=(settings.AZURE_OPENAI_DEPLOYMENT_CHAT if settings.USE_AZURE_OPENAI else settings.ROUTER_MODEL),
+            messages=[
+                {"role": "system", "content": SUMMARY_PROMPT_SYSTEM},
+                {"role": "user", "content": f"기존 요약:\n{previous or '(없음)'}\n\n새 대화:\n{convo}"},
+            ],
+            temperature=0.2,
+            max_tokens=200,
+        )
+        summary = (r.choices[0].message.content or "").strip()
+        if summary:
+            update_session_summary(sid, summary, older[-1]['id'])
+    except Exception as e:
+        logger.warning("Failed to refresh session summary: %s", e)
+
 # 메시지 저장 헬퍼
-def _save_user_message(session_id: str, text: str):
-    """사용자 메시지 저장"""
+def _save_user_message(session_id: str, text: str, title: Optional[str] = None):
+    """사용자 메시지 저장 (title이 있으면 같은 트랜잭션에서 세션 제목도 설정)"""
     if text:
         try:
             # session_id가 문자열이면 정수로 변환
             session_id_int = int(session_id) if isinstance(session_id, str) else session_id
-            add_message(session_id_int, role="user", content=text)
+            with _HISTORY_LOCK:
+                add_message_and_maybe_title(session_id_int, "user", text, title)
+                _remember_message(session_id_int, "user", text)
         except Exception as e:
-            logger.error(f"Failed to save user message: {e}")
+            logger.error("Failed to save user message: %s", e)
 
 def _save_assistant_text(session_id: str, text: str):
     """어시스턴트 텍스트 메시지 저장"""
@@ -352,22 +556,74 @@ def _save_assistant_text(session_id: str, text: str):
         try:
             # session_id가 문자열이면 정수로 변환
             session_id_int = int(session_id) if isinstance(session_id, str) else session_id
-            add_message(session_id_int, role="assistant", content=text)
+            with _HISTORY_LOCK:
+                add_message(session_id_int, role="assistant", content=text)
+                _remember_message(session_id_int, "assistant", text)
         except Exception as e:
-            logger.error(f"Failed to save assistant text: {e}")
+            logger.error("Failed to save assistant text: %s", e)
 
-def _save_assistant_image(session_id: str, url: str, meta: Optional[Dict[str, Any]] = None):
-    """어시스턴트 이미지 메시지 저장"""
-    if url:
-        try:
-            content = f"[image] {url}"
-            if meta:
-                content += f" | {str(meta)}"
-            # session_id가 문자열이면 정수로 변환
-            session_id_int = int(session_id) if isinstance(session_id, str) else session_id
-            add_message(session_id_int, role="assistant", content=content)
-        except Exception as e:
-            logger.error(f"Failed to save assistant image: {e}")
+def _json_default(obj: Any) -> Any:
+    """pydantic 모델 등 JSON 기본 타입이 아닌 값 직렬화"""
+    if hasattr(obj, "model_dump"):
+        return obj.model_dump()
+    raise TypeError(f"not JSON serializable: {type(obj).__name__}")
+
+def _json_dumps(obj: Any) -> str:
+    """압축 JSON 문자열 직렬화 (orjson 있으면 사용, 한글은 이스케이프하지 않음)"""
+    if orjson is not None:
+        return orjson.dumps(obj, default=_json_default).decode()
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=_json_default)
+
+def _image_message_content(url: str, meta: Optional[Dict[str, Any]] = None) -> str:
+    content = f"[image] {url}"
+    if meta:
+        content += " | " + _json_dumps(meta)
+    return content
+
+def _save_assistant_reply(session_id: str, text: str, url: Optional[str] = None,
+                          meta: Optional[Dict[str, Any]] = None, dedup: bool = False,
+                          urls: Optional[List[str]] = None):
+    """어시스턴트 텍스트 + 이미지 메시지를 한 트랜잭션으로 저장 (dedup: 직전 동일 텍스트 생략, urls: 여러 장이면 장마다 한 행)
+
+    이미지 URL이 있으면 호출 측에서 await: 다음 턴의 마지막 이미지 조회/편집 전환이 이 행을 읽어야 함
+    """
+    try:
+        sid = int(session_id) if isinstance(session_id, str) else session_id
+        image_rows = [("assistant", _image_message_content(u, meta)) for u in (urls or ([url] if url else []))]
+        with _HISTORY_LOCK:
+            rows = []
+            if text:
+                last = (_cached_history(sid) or [{}])[-1] if dedup else {}
+                if not (last.get('role') == 'assistant' and (last.get('content') or '').strip() == text.strip()):
+                    rows.append(("assistant", text))
+            rows.extend(image_rows)
+            add_messages(sid, rows)
+            for role, content in rows:
+                _remember_message(sid, role, content)
+    except Exception as e:
+        logger.error("Failed to save assistant reply: %s", e)
+
+# LLM 제목 생성 실패 시 키워드 기반 제목 (단일 정규식 1회 스캔)
+_TITLE_RE = re.compile(r"(?P<img>이미지|사진|그림)|(?P<sum>요약|정리)|(?P<trans>번역)")
+_TITLE_MAP = {"img": "이미지 생성 요청", "sum": "요약 요청", "trans": "번역 요청"}
+
+def _classify_title(text: str) -> Optional[str]:
+    """메시지의 제목 키워드 버킷 (img/sum/trans), 없으면 None"""
+    m = _TITLE_RE.search(text or "")
+    return m.lastgroup if m else None
+
+@functools.lru_cache(maxsize=1024)
+def _title_for(bucket: Optional[str], user_name: str) -> str:
+    """(버킷, 사용자 이름) → 세션 제목 (같은 조합은 캐시 재사용)"""
+    if bucket:
+        return f"{user_name}님의 {_TITLE_MAP[bucket]}" if user_name else _TITLE_MAP[bucket]
+    return f"{user_name}님과의 대화" if user_name else "새 대화"
+
+def _fallback_title(text: str) -> str:
+    bucket = _classify_title(text)
+    if bucket:
+        return _title_for(bucket, "")
+    return text.strip()[:20] or "새 대화"
 
 # 세션 타이틀 설정
 def _maybe_set_session_title(session_id: str, first_user_text: str):
@@ -375,15 +631,7 @@ def _maybe_set_session_title(session_id: str, first_user_text: str):
     try:
         if not first_user_text:
             return
-        from app.prompts import TITLE_PROMPT_SYSTEM
-        from app.settings import settings
-        from openai import OpenAI, AzureOpenAI
-        client = (
-            AzureOpenAI(api_key=settings.AZURE_OPENAI_API_KEY,
-                        api_version=settings.AZURE_OPENAI_API_VERSION,
-                        azure_endpoint=settings.AZURE_OPENAI_ENDPOINT)
-            if settings.USE_AZURE_OPENAI else OpenAI(api_key=settings.OPENAI_API_KEY)
-        )
+        client = get_chat_client()
         try:
             model_name = (
                 settings.AZURE_OPENAI_DEPLOYMENT_CHAT if settings.USE_AZURE_OPENAI else settings.ROUTER_MODEL
@@ -399,12 +647,66 @@ def _maybe_set_session_title(session_id: str, first_user_text: str):
             )
             title = (r.choices[0].message.content or "새 대화").strip()
         except Exception:
-            title = (first_user_text.strip()[:20] or "새 대화")
+            title = _fallback_title(first_user_text)
         # session_id가 문자열이면 정수로 변환
         session_id_int = int(session_id) if isinstance(session_id, str) else session_id
         update_session_title(session_id_int, title[:40])
     except Exception as e:
-        logger.warning(f"Failed to set session title: {e}")
+        logger.warning("Failed to set session title: %s", e)
+
+# Clarify 질문 생성 시 사용자 메시지 템플릿 (모듈 로드 시 1회 생성)
+_CLARIFY_USER_TEMPLATE = (
+    "현재 상황: 사용자가 '{message}'라고 요청했습니다. 객체는 '{obj_kr}'이고 형용사는 '{adj}'입니다.\n"
+    "{adj} {obj_kr} 사진을 만들어주세요"
+)
+
+# LLM 대화 실패 시 고정 답변. 재시도 안내일 뿐이라 기본적으로 대화 기록에 남기지 않음
+_CHAT_FALLBACK_REPLY = "죄송해요, 잠시 문제가 발생했어요. 다시 시도해주세요."
+_PERSIST_FALLBACKS = False
+
+# 안전 가드에 걸린 요청에 대한 고정 답변
+_SAFETY_REPLY = (
+    "죄송해요. 해당 요청은 폭력·불법 행위를 조장/미화할 수 있어 도와드릴 수 없어요.\n"
+    "대신 안전하고 긍정적인 주제의 네컷 만화 아이디어를 함께 만들어볼까요?"
+)
+
+# Fast-path 응답 문구: intent → (로그용 이름, 답변, 저장 메타 desc)
+_FAST_PATH_REPLIES = {
+    "edit": ("edit", "사진을 바로 편집했어요.", "즉시 편집 실행"),
+    "generate": ("generate", "요청하신 스타일로 새 이미지를 만들었어요.", "즉시 생성 실행"),
+}
+
+# ADK 실패 시 직접 호출할 툴: intent → (툴, payload·프롬프트에서 인자 구성)
+_DIRECT_TOOLS = {
+    "generate": lambda p, prompt: (generate_image_tool, {"prompt": prompt, "size": p.get("size", "1024x1024")}),
+    "edit": lambda p, prompt: (edit_image_tool, {
+        "image_path": p.get("image_path"),
+        "prompt": prompt,
+        "mask_path": p.get("mask_path"),
+        "selection_path": p.get("selection_path"),
+        "size": p.get("size", "1024x1024"),
+    }),
+}
+
+async def _save_upload(up: Optional[UploadFile]) -> Optional[str]:
+    """업로드 파일을 워커 스레드에서 저장 (없으면 None)"""
+    if not up:
+        return None
+    return await asyncio.to_thread(ensure_saved_file, up)
+
+async def _run_image_task(payload: Dict[str, Any], kind: str) -> Any:
+    """이미지 태스크 실행: ADK 경유 우선, ADK 비활성/예외 시 직접 툴 호출"""
+    out = None
+    if os.getenv("USE_ADK", "true").lower() not in ("0","false","no"):
+        try:
+            timeout_s = float(os.getenv("ADK_TIMEOUT", "25"))
+            out = await adk_run_async(_json_dumps(payload), timeout=timeout_s)
+        except Exception as adk_e:
+            logger.warning("Fast-path ADK %s failed, fallback to direct tool: %s", kind, adk_e)
+    if out is None:
+        tool, kwargs = _DIRECT_TOOLS[payload["intent"]](payload, payload["prompt_en"])
+        out = await asyncio.to_thread(tool, **kwargs)
+    return out
 
 async def orchestrate(message: str,
                       images: List[UploadFile],
@@ -416,11 +718,11 @@ async def orchestrate(message: str,
                       history: Optional[List[Dict[str,str]]] = None,
                       session=None,
                       intent_override: Optional[str] = None,
-                      pending_id: Optional[str] = None) -> ChatResponse:
-    """메인 오케스트레이션 함수"""
+                      pending_id: Optional[str] = None,
+                      on_delta: Optional[Callable[[str], None]] = None) -> ChatResponse:
+    """메인 오케스트레이션 함수 (on_delta가 있으면 일반 대화 답변을 생성되는 대로 조각 단위로 전달)"""
     # ✅ 세션/히스토리 보장
     # 규칙: 전달된 session_id가 있고 유효하면 계속 사용, 없거나 무효하면 새로 생성
-    from app.database import get_user_by_name, get_chat_sessions_by_user, create_chat_session, get_chat_session
     def _is_digit_sid(s: str) -> bool:
         try:
             int(s)
@@ -428,153 +730,119 @@ async def orchestrate(message: str,
         except Exception:
             return False
 
-    # 사용자 확보
-    if user_name.strip():
-        user = get_user_by_name(user_name.strip())
-        if not user:
-            from app.database import create_user
-            user = create_user(user_name.strip())
-        user_id = user['id']
-    else:
-        # 익명 사용자 처리
-        user = get_user_by_name("anonymous")
-        if not user:
-            from app.database import create_user
-            user = create_user("anonymous")
-        user_id = user['id']
+    # 키워드 감지용 소문자 메시지는 요청당 1회만 생성해 헬퍼들에 전달
+    message_lower = (message or "").lower()
+
+    # 사용자 확보 (이름이 없으면 익명 사용자)
+    user = await asyncio.to_thread(ensure_user, user_name.strip() or "anonymous")
+    user_id = user['id']
 
     # 세션 확보: 유효한 세션 ID가 있으면 그대로 사용, 없으면 새로 생성
     need_new_session = True
     if session_id and _is_digit_sid(session_id):
         # 숫자 세션이면 존재 여부 확인
-        existing_session = get_chat_session(int(session_id))
+        existing_session = await asyncio.to_thread(get_chat_session_cached, int(session_id))
         if existing_session:
             need_new_session = False
-            logger.info(f"Continuing existing session: {session_id}")
+            logger.info("Continuing existing session: %s", session_id)
 
     if need_new_session:
-        title = f"{user_name}님과의 대화" if user_name.strip() else "새 대화"
-        new_sess = create_chat_session(user_id, title)
+        title = _title_for(_classify_title(message), user_name.strip())
+        new_sess = await asyncio.to_thread(create_chat_session, user_id, title)
         session_id = str(new_sess['id'])
-        logger.info(f"Created new session: {session_id}")
+        logger.info("Created new session: %s", session_id)
     
-    session_id, db_history = _ensure_session_and_history(session_id, user_name, history_limit=16)
+    session_id, db_history = await asyncio.to_thread(_ensure_session_and_history, session_id, user_name, history_limit=16)
     history = history or db_history
+    # 저장된 메시지가 없는 세션의 첫 턴에만 제목을 만든다
+    is_first_turn = not db_history
     
     # 온보딩: 작업을 가로막지 않도록 '지연' 처리. 단, 사용자가 이름을 말하면 즉시 처리
     defer_greet = False
     if session and not session.is_onboarded:
-        from app.onboarding_service import onboarding_service
         # 사용자가 이름을 직접 말했으면 즉시 온보딩 완료
         try:
             extracted = onboarding_service.extract_user_name(message)
         except Exception:
             extracted = None
         if extracted:
-            onboarding_response, is_onboarding = onboarding_service.handle_onboarding(message, session)
+            # 인사/라치 저장은 백그라운드로 돌리고 바로 응답. 온보딩 서비스가 직접 메시지를 저장하므로 저장 후 캐시 무효화
+            def _persist_onboarding(func, *args, **kwargs):
+                task = _spawn_background(func, *args, **kwargs)
+                task.add_done_callback(lambda _t, sid=session.session_id: forget_session_history(sid))
+                return task
+
+            onboarding_response, is_onboarding = onboarding_service.handle_onboarding(
+                message, session, persist=_persist_onboarding
+            )
+            forget_session_history(session.session_id)
             if onboarding_response:
                 return ChatResponse(reply=onboarding_response, meta={"onboarding": is_onboarding})
         else:
             # 이름을 아직 모르면, 이번 턴 작업 수행 후 가벼운 권유를 덧붙이기 위해 지연 플래그만 설정
             defer_greet = True
 
-    # 사용자 메시지 먼저 저장
-    _save_user_message(session_id, message)
+    # 사용자 메시지 먼저 저장. 기존 빈 세션의 첫 턴이면 키워드 제목도 같은 트랜잭션으로 기록
+    # (새로 만든 세션은 생성 시 이미 키워드 제목을 가짐, LLM 제목은 아래에서 백그라운드로 덮어씀)
+    quick_title = _title_for(_classify_title(message), user_name.strip()) if is_first_turn and not need_new_session else None
+    await asyncio.to_thread(_save_user_message, session_id, message, quick_title)
+    if _summary_due(session_id):
+        _spawn_background(_refresh_session_summary, session_id)
     # 간단한 안전 가드(폭력/불법 행위 조장 요청 차단)
     try:
-        from app.safety import detect_prohibited
-        violation = detect_prohibited(message)
+        violation = detect_prohibited(message_lower)
     except Exception:
         violation = None
     if violation:
-        safe_reply = (
-            "죄송해요. 해당 요청은 폭력·불법 행위를 조장/미화할 수 있어 도와드릴 수 없어요.\n"
-            "대신 안전하고 긍정적인 주제의 네컷 만화 아이디어를 함께 만들어볼까요?"
-        )
-        _save_assistant_text(session_id, safe_reply)
-        return ChatResponse(reply=safe_reply, meta={"session_id": session_id})
-    _maybe_set_session_title(session_id, message)
+        _spawn_background(_save_assistant_text, session_id, _SAFETY_REPLY)
+        return ChatResponse(reply=_SAFETY_REPLY, meta={"session_id": session_id})
+    # 제목 생성(LLM)은 세션 첫 턴에만, 응답에 필요 없으므로 이미지/라우팅 처리와 겹쳐서 백그라운드로 실행
+    if is_first_turn:
+        _spawn_background(_maybe_set_session_title, session_id, message)
 
     # 펜딩 상태 조회 (세션 객체 기준)
     pending = session.pending_task if session else None
     was_asked = session.asked_once if session else False
     
-    logger.info(f"ORCHESTRATE: session={session_id}, pending={pending is not None}, was_asked={was_asked}, message={message[:50]}")
+    logger.info("ORCHESTRATE: session=%s, pending=%s, was_asked=%s, message=%s", session_id, pending is not None, was_asked, message[:50])
 
-    # 업로드 파일 즉시 저장(편집 대비)
-    image_path = image_path_str or (ensure_saved_file(images[0]) if images else None)
-    mask_path = ensure_saved_file(mask) if mask else None
-    selection_path = ensure_saved_file(selection) if selection else None
+    # 업로드 파일 즉시 저장(편집 대비): 디스크 쓰기는 이벤트 루프 밖에서 동시에
+    upload_image = images[0] if images and not image_path_str else None
+    saved_image, mask_path, selection_path = await asyncio.gather(
+        _save_upload(upload_image), _save_upload(mask), _save_upload(selection)
+    )
+    image_path = image_path_str or saved_image
 
     # ── Fast-path: 파일 첨부 시 기본은 편집, 단 '새로'류 문구면 생성으로 오버라이드 ──
     _msg = (message or "").strip()
-    if image_path and not _wants_generate_override(_msg):
-        try:
-            prompt_fast = _msg if _msg else (
+    wants_generate = _wants_generate_override(_msg)
+    fast_payload = None
+    if image_path and not wants_generate:
+        fast_payload = {
+            "intent": "edit",
+            "image_path": image_path,
+            "selection_path": selection_path,
+            "size": "1024x1024",
+            "prompt_en": _msg if _msg else (
                 "Global cleanup only: remove minor artifacts, color balance, improve sharpness. "
                 "Keep original character style, line work, composition, and lighting."
-            )
-            # ADK 경유 우선, 실패 시 폴백
-            import os, json
-            use_adk = os.getenv("USE_ADK", "true").lower() not in ("0","false","no")
-            timeout_s = float(os.getenv("ADK_TIMEOUT", "25"))
-            out_fast = None
-            payload_fast = {
-                "intent": "edit",
-                "image_path": image_path,
-                "selection_path": selection_path,
-                "size": "1024x1024",
-                "prompt_en": prompt_fast,
-            }
-            if use_adk:
-                try:
-                    from app.adk import adk_run
-                    out_fast = adk_run(json.dumps(payload_fast, ensure_ascii=False), timeout=timeout_s)
-                except Exception as adk_e:
-                    logger.warning(f"Fast-path ADK edit failed, fallback to direct tool: {adk_e}")
-            if out_fast is None:
-                out_fast = edit_image_tool(
-                    image_path=image_path,
-                    prompt=prompt_fast,
-                    size="1024x1024",
-                    selection_path=selection_path,
-                )
+            ),
+        }
+    elif wants_generate:
+        fast_payload = {
+            "intent": "generate",
+            "size": "1024x1024",
+            "prompt_en": _IMAGE_REF_RE.sub("", _msg) or "cute character on white background",
+        }
+    if fast_payload:
+        kind, reply_fast, desc_fast = _FAST_PATH_REPLIES[fast_payload["intent"]]
+        try:
+            out_fast = await _run_image_task(fast_payload, kind)
             if isinstance(out_fast, dict) and out_fast.get("status") == "ok" and out_fast.get("url"):
-                reply_fast = "사진을 바로 편집했어요."
-                _save_assistant_text_dedup(session_id, reply_fast)
-                _save_assistant_image(session_id, out_fast["url"], meta={"desc": "즉시 편집 실행"})
+                await asyncio.to_thread(_save_assistant_reply, session_id, reply_fast, out_fast["url"], meta={"desc": desc_fast}, dedup=True)
                 return ChatResponse(reply=reply_fast, url=out_fast["url"], meta={"session_id": session_id})
         except Exception as e:
-            logger.warning(f"Fast-path edit failed, falling back to normal flow: {e}")
-
-    if _wants_generate_override(_msg):
-        try:
-            prompt_gen = re.sub(r"(이 사진|이 이미지|사진|이미지)", "", _msg) or "cute character on white background"
-            # ADK 경유 우선, 실패 시 폴백
-            import os, json
-            use_adk = os.getenv("USE_ADK", "true").lower() not in ("0","false","no")
-            timeout_s = float(os.getenv("ADK_TIMEOUT", "25"))
-            out_gen = None
-            payload_gen = {
-                "intent": "generate",
-                "size": "1024x1024",
-                "prompt_en": prompt_gen,
-            }
-            if use_adk:
-                try:
-                    from app.adk import adk_run
-                    out_gen = adk_run(json.dumps(payload_gen, ensure_ascii=False), timeout=timeout_s)
-                except Exception as adk_e:
-                    logger.warning(f"Fast-path ADK generate failed, fallback to direct tool: {adk_e}")
-            if out_gen is None:
-                out_gen = generate_image_tool(prompt=prompt_gen, size="1024x1024")
-            if isinstance(out_gen, dict) and out_gen.get("status") == "ok" and out_gen.get("url"):
-                reply_gen = "요청하신 스타일로 새 이미지를 만들었어요."
-                _save_assistant_text_dedup(session_id, reply_gen)
-                _save_assistant_image(session_id, out_gen["url"], meta={"desc": "즉시 생성 실행"})
-                return ChatResponse(reply=reply_gen, url=out_gen["url"], meta={"session_id": session_id})
-        except Exception as e:
-            logger.warning(f"Fast-path generate failed, falling back to normal flow: {e}")
+            logger.warning("Fast-path %s failed, falling back to normal flow: %s", kind, e)
     
     # 선택/마스크가 온 경우, 편집 펜딩 태스크를 미리 구성해 2턴 없이 바로 실행 가능하도록 준비
     if (selection_path or mask_path) and not pending:
@@ -600,13 +868,13 @@ async def orchestrate(message: str,
             try:
                 pend_dict = session.pending_task if isinstance(session.pending_task, dict) else {}
                 base_spec = pend_dict.get("spec", {})
-                merged_spec = _build_edit_spec(message)["spec"]
+                merged_spec = (await asyncio.to_thread(_build_edit_spec, message))["spec"]
                 # 병합: 값이 있는 항목만 덮어씀
                 for k, v in (merged_spec or {}).items():
                     if v:
                         base_spec[k] = v
                 final_prompt = _compose_edit_prompt(base_spec)
-                out = edit_image_tool(
+                out = await asyncio.to_thread(edit_image_tool,
                     image_path=pend_dict.get("image_path") or image_path,
                     prompt=final_prompt,
                     size=pend_dict.get("size") or "1024x1024",
@@ -616,18 +884,15 @@ async def orchestrate(message: str,
                 session.clear_pending_task()
                 reply = "요청하신 내용을 반영해 이미지를 수정할게요."
                 if isinstance(out, dict) and out.get("status") == "ok" and out.get("url"):
-                    _save_assistant_text(session_id, reply)
-                    _save_assistant_image(session_id, out["url"], meta={"desc": "선택 영역 편집 적용"})
+                    await asyncio.to_thread(_save_assistant_reply, session_id, reply, out["url"], meta={"desc": "선택 영역 편집 적용"})
                     return ChatResponse(reply=reply, url=out["url"], meta={"desc": "선택 영역 편집 적용", "session_id": session_id})
-                from app.error_handler import ImageGenerationError
                 raise ImageGenerationError(f"편집 실패: {out}")
             except Exception as e:
-                logger.error(f"edit_user_image second turn failed: {e}")
-                from app.error_handler import ImageGenerationError
+                logger.error("edit_user_image second turn failed: %s", e)
                 raise ImageGenerationError(str(e))
 
         # 1턴: Clarify-Once 필요 여부 판단
-        clarify = _build_edit_spec(message)
+        clarify = await asyncio.to_thread(_build_edit_spec, message)
         spec, missing, question = clarify["spec"], clarify["missing"], clarify["question"]
         if missing and session and not session.asked_once:
             pend = {
@@ -639,12 +904,12 @@ async def orchestrate(message: str,
             }
             session.set_pending_task(pend)
             reply_q = question or "원하는 수정을 한 줄로 알려주세요."
-            _save_assistant_text_dedup(session_id, reply_q)
+            _spawn_background(_save_assistant_text_dedup, session_id, reply_q)
             return ChatResponse(reply=reply_q, meta={"need_more_info": True, "session_id": session_id})
         else:
             # 충분 → 바로 편집 실행
             final_prompt = _compose_edit_prompt(spec)
-            out = edit_image_tool(
+            out = await asyncio.to_thread(edit_image_tool,
                 image_path=image_path,
                 prompt=final_prompt,
                 size="1024x1024",
@@ -652,10 +917,8 @@ async def orchestrate(message: str,
             )
             reply = "설명해 주신 대로 이미지를 수정할게요."
             if isinstance(out, dict) and out.get("status") == "ok" and out.get("url"):
-                _save_assistant_text(session_id, reply)
-                _save_assistant_image(session_id, out["url"], meta={"desc": "선택 영역 편집 적용"})
+                await asyncio.to_thread(_save_assistant_reply, session_id, reply, out["url"], meta={"desc": "선택 영역 편집 적용"})
                 return ChatResponse(reply=reply, url=out["url"], meta={"desc": "선택 영역 편집 적용", "session_id": session_id})
-            from app.error_handler import ImageGenerationError
             raise ImageGenerationError(f"편집 실패: {out}")
 
     # Core policy: Fast-path (충분 정보면 바로 실행) + Clarify 1회 (불충분시에만)
@@ -664,21 +927,27 @@ async def orchestrate(message: str,
         decision = RouterDecision(next_action="run", task=pending)
     elif not was_asked and pending is None:
         # 첫 번째 턴: 이미지 생성/편집 의도 감지
-        logger.info(f"ROUTER CALL: message='{message}', history_len={len(history)}")
-        decision = route_with_llm(history, message, None)
-        logger.info(f"FIRST TURN: decision={decision.next_action}, clarify_question={decision.clarify_question[:50] if decision.clarify_question else 'None'}")
+        logger.info("ROUTER CALL: message='%s', history_len=%s", message, len(history))
+        # 라우터 LLM 대기 동안 이미지 툴 커넥션을 미리 열어 run 결정 시 TLS 핸드셰이크 생략
+        _spawn_background(warm_image_client)
+        decision = await _cached_route(history, message, None)
+        logger.info("FIRST TURN: decision=%s, clarify_question=%s", decision.next_action, (decision.clarify_question or 'None')[:50])
         
         if decision.next_action == "run":
             # 충분 정보가 있으면 바로 실행 (질문 생략)
             logger.info("FAST-PATH: 충분 정보로 바로 실행")
         elif decision.next_action == "ask":
             # 불충분 정보 → 1회 질문만
-            logger.info(f"CLARIFY 1회: {decision.clarify_question[:50] if decision.clarify_question else 'None'}")
+            logger.info("CLARIFY 1회: %s", (decision.clarify_question or 'None')[:50])
         elif decision.next_action == "chat":
             # 라우터가 chat으로 본 경우에도, 최근 이미지가 있고 메시지가 편집 의도면 편집으로 전환
             try:
-                if _classify_edit_intent(message):
-                    last_url = _get_last_image_url(session_id)
+                # 분류 LLM과 최근 이미지 조회를 동시에 진행
+                is_edit, last_url = await asyncio.gather(
+                    _classify_edit_intent_async(message),
+                    asyncio.to_thread(_get_last_image_url, session_id),
+                )
+                if is_edit:
                     if last_url:
                         # 최근 이미지를 편집 대상으로 설정
                         t = GenerationTask(intent="edit", image_path=last_url)
@@ -694,17 +963,13 @@ async def orchestrate(message: str,
         # 두 번째 턴 이후: 의도 유지 여부 확인 후 실행
         if was_asked and pending:
             # 이미 질문했는데 펜딩이 있으면 의도 유지 여부 확인
-            decision = route_with_llm(history, message, pending)
-            logger.info(f"SECOND TURN: decision={decision.next_action}")
+            decision = await _cached_route(history, message, pending)
+            logger.info("SECOND TURN: decision=%s", decision.next_action)
             
             if decision.next_action == "run":
                 # 의도 유지 → 기본값 채워서 실행
-                slots = _extract_slots_from_message(message)
-                for key, value in slots.items():
-                    setattr(pending, key, value)
-                
                 # 프롬프트 생성 (부족한 정보는 기본값으로) - 스타일 템플릿 반영
-                pending.prompt_en = _build_prompt(pending)
+                pending.prompt_en = _build_prompt(_apply_slots(pending, message_lower))
                 
                 logger.info("SECOND TURN: 의도 유지, 기본값으로 실행")
             elif decision.next_action == "chat":
@@ -714,22 +979,21 @@ async def orchestrate(message: str,
                 logger.info("SECOND TURN: 의도 변경, 대화 전환")
         elif pending:
             # 펜딩이 있으면 두 번째 턴부터는 라우터 재호출 없이 바로 실행(run)
-            slots = _extract_slots_from_message(message)
-            for key, value in slots.items():
-                setattr(pending, key, value)
+            _apply_slots(pending, message_lower)
             if getattr(pending, 'intent', None) is None:
                 pending.intent = 'generate'
             if pending.intent == 'generate':
-                pending = _fill_defaults(pending, message)
+                pending = _fill_defaults(pending, message_lower)
                 pending.prompt_en = _build_prompt(pending)
             decision = RouterDecision(next_action="run", task=pending)
             logger.info("PENDING FAST-RUN: execute without re-routing")
         else:
             # 일반적인 경우 라우터 호출
-            decision = route_with_llm(history, message, None)
-            logger.info(f"ROUTER CALL: decision={decision.next_action}")
+            _spawn_background(warm_image_client)
+            decision = await _cached_route(history, message, None)
+            logger.info("ROUTER CALL: decision=%s", decision.next_action)
 
-    logger.info(f"FINAL DECISION: {decision.next_action}")
+    logger.info("FINAL DECISION: %s", decision.next_action)
 
     # ── 액션별 처리 ───────────────────────────────────────────────────────
     if decision.next_action == "ask":
@@ -737,44 +1001,23 @@ async def orchestrate(message: str,
         if not was_asked:
             # 첫 번째 질문: 기본 GenerationTask 생성
             if pending is None:
-                basic_task = _create_basic_task(message)
+                basic_task = _create_basic_task(message_lower)
                 session.set_pending_task(basic_task)
             else:
                 session.set_pending_task(pending)
             
             # LLM 기반으로 상황 맞춤 질문 생성 (실패 시 템플릿 폴백)
-            from app.prompts import ASK_CLARIFY_SYSTEM_PROMPT, render_clarify_once
-            from openai import OpenAI, AzureOpenAI
-            from app.settings import settings
             # 객체와 형용사 추출
-            obj_kr = "이미지"
-            adj = "귀여운"
-            if "강아지" in message or "dog" in message.lower():
-                obj_kr = "강아지"
-            elif "고양이" in message or "cat" in message.lower():
-                obj_kr = "고양이"
-            elif "셰퍼드" in message or "german shepherd" in message.lower():
-                obj_kr = "셰퍼드"
-                adj = "멋진"
-            elif "차" in message or "car" in message.lower():
-                obj_kr = "자동차"
-                adj = "멋진"
-            elif "풍경" in message or "landscape" in message.lower():
-                obj_kr = "풍경"
-                adj = "아름다운"
+            detected = _detect_object(message_lower, _CLARIFY_SUBJECT_RULES)
+            _, obj_kr, adj = detected or (None, "이미지", "귀여운")
             try:
-                client = (
-                    AzureOpenAI(api_key=settings.AZURE_OPENAI_API_KEY,
-                                api_version=settings.AZURE_OPENAI_API_VERSION,
-                                azure_endpoint=settings.AZURE_OPENAI_ENDPOINT)
-                    if settings.USE_AZURE_OPENAI else OpenAI(api_key=settings.OPENAI_API_KEY)
-                )
-                system_prompt = ASK_CLARIFY_SYSTEM_PROMPT + f"\n\n현재 상황: 사용자가 '{message}'라고 요청했습니다. 객체는 '{obj_kr}'이고 형용사는 '{adj}'입니다."
-                response = client.chat.completions.create(
+                client = get_chat_client()
+                response = await asyncio.to_thread(client.chat.completions.create,
                     model=(settings.AZURE_OPENAI_DEPLOYMENT_CHAT if settings.USE_AZURE_OPENAI else settings.ROUTER_MODEL),
                     messages=[
-                        {"role": "system", "content": system_prompt},
-                        {"role": "user", "content": f"{adj} {obj_kr} 사진을 만들어주세요"}
+                        # 시스템 프롬프트는 고정(프롬프트 캐시 적중), 요청별 상황은 사용자 메시지로
+                        {"role": "system", "content": ASK_CLARIFY_SYSTEM_PROMPT},
+                        {"role": "user", "content": _CLARIFY_USER_TEMPLATE.format(message=message, obj_kr=obj_kr, adj=adj)}
                     ],
                     temperature=0.6,
                     max_tokens=300
@@ -783,63 +1026,53 @@ async def orchestrate(message: str,
                 if not clarify_question:
                     raise RuntimeError("empty_clarify")
             except Exception as e:
-                logger.warning(f"Clarify LLM failed, fallback to template: {e}")
+                logger.warning("Clarify LLM failed, fallback to template: %s", e)
                 clarify_question = render_clarify_once(user_name=user_name, obj_kr=obj_kr, adj=adj)
             
-            _save_assistant_text_dedup(session_id, clarify_question)
+            _spawn_background(_save_assistant_text_dedup, session_id, clarify_question)
             return ChatResponse(reply=clarify_question, meta={"need_more_info": True, "session_id": session_id})
         else:
             # 이미 질문했으면 강제로 실행 (기본값으로 보정)
             if pending:
-                slots = _extract_slots_from_message(message)
-                for key, value in slots.items():
-                    setattr(pending, key, value)
-                
-                # 프롬프트 생성 (기본값 보강: 귀엽고 따뜻한 분위기)
-                style_str = pending.style or "illustration"
-                bg_str = pending.bg or "white background"
-                pose_str = pending.pose or "natural pose"
-                obj_str = pending.object or "subject"
-                pending.prompt_en = (
-                    f"A {style_str} style {obj_str} in {bg_str}, {pose_str}, cute, warm, cozy, high quality"
-                )
-                
+                pending.prompt_en = _forced_prompt(_apply_slots(pending, message_lower))
                 decision = RouterDecision(next_action="run", task=pending)
                 logger.info("FORCED RUN: already asked, using defaults")
             else:
-                from app.prompts import get_general_chat_response
                 reply = get_general_chat_response(user_name)
-                _save_assistant_text(session_id, reply)
+                _spawn_background(_save_assistant_text, session_id, reply)
                 return ChatResponse(reply=reply, meta={"session_id": session_id})
 
     if decision.next_action == "chat":
         # prompts.py의 프롬프트 사용
-        from app.prompts import CHAT_NO_ONBOARDING_PROMPT
-        from openai import OpenAI, AzureOpenAI
-        from app.settings import settings
-        client = (
-            AzureOpenAI(api_key=settings.AZURE_OPENAI_API_KEY,
-                        api_version=settings.AZURE_OPENAI_API_VERSION,
-                        azure_endpoint=settings.AZURE_OPENAI_ENDPOINT)
-            if settings.USE_AZURE_OPENAI else OpenAI(api_key=settings.OPENAI_API_KEY)
-        )
+        client = get_chat_client()
         
+        chat_kwargs = dict(
+            model=(settings.AZURE_OPENAI_DEPLOYMENT_CHAT if settings.USE_AZURE_OPENAI else settings.ROUTER_MODEL),
+            messages=[
+                {"role": "system", "content": CHAT_NO_ONBOARDING_PROMPT},
+                {"role": "user", "content": message}
+            ],
+            temperature=0.7,
+            max_tokens=500
+        )
         try:
-            response = client.chat.completions.create(
-                model=(settings.AZURE_OPENAI_DEPLOYMENT_CHAT if settings.USE_AZURE_OPENAI else settings.ROUTER_MODEL),
-                messages=[
-                    {"role": "system", "content": CHAT_NO_ONBOARDING_PROMPT},
-                    {"role": "user", "content": message}
-                ],
-                temperature=0.7,
-                max_tokens=500
-            )
-            reply = response.choices[0].message.content
+            if on_delta is None:
+                response = await asyncio.to_thread(client.chat.completions.create, **chat_kwargs)
+                reply = response.choices[0].message.content
+            else:
+                # 스트리밍: 워커 스레드에서 받은 조각을 이벤트 루프로 넘겨 즉시 전달
+                loop = asyncio.get_running_loop()
+                reply = await asyncio.to_thread(
+                    _stream_chat_completion, client,
+                    lambda text: loop.call_soon_threadsafe(on_delta, text),
+                    **chat_kwargs
+                )
         except Exception as e:
-            logger.error(f"LLM chat error: {e}")
-            reply = "죄송해요, 잠시 문제가 발생했어요. 다시 시도해주세요."
+            logger.error("LLM chat error: %s", e)
+            reply = _CHAT_FALLBACK_REPLY
         
-        _save_assistant_text(session_id, reply)
+        if reply is not _CHAT_FALLBACK_REPLY or _PERSIST_FALLBACKS:
+            _spawn_background(_save_assistant_text, session_id, reply)
         return ChatResponse(reply=reply, meta={"session_id": session_id})
 
     # ── 실행 분기 ─────────────────────────────────────────────────────────
@@ -847,8 +1080,8 @@ async def orchestrate(message: str,
     
     # 안전장치: 최소 필드 확인
     if not _has_minimum_fields(task):
-        task = _fill_defaults(task, message)
-        logger.warning(f"MINIMUM FIELDS MISSING: filled defaults for {task.object}")
+        task = _fill_defaults(task, message_lower)
+        logger.warning("MINIMUM FIELDS MISSING: filled defaults for %s", task.object)
     
     if task.intent == "edit":
         if image_path and not task.image_path: 
@@ -859,7 +1092,8 @@ async def orchestrate(message: str,
             task.selection_path = selection_path
 
     payload = task.model_dump()
-    logger.info(f"EXECUTING: {payload}")
+    logger.info("EXECUTING: intent=%s", payload.get("intent"))
+    logger.debug("EXECUTING payload: %s", payload)
     
     # 실행 확정 시에만 펜딩 제거
     if session:
@@ -870,55 +1104,45 @@ async def orchestrate(message: str,
         if payload.get("intent") == "edit":
             # 이미지 경로 보강: 없으면 최근 이미지 사용, 그래도 없으면 질문 1회
             if not payload.get("image_path"):
-                last_url = _get_last_image_url(session_id)
+                last_url = await asyncio.to_thread(_get_last_image_url, session_id)
                 if last_url:
                     payload["image_path"] = last_url
                 else:
                     ask_img = "편집할 사진을 올려 주세요. 방금 만든 이미지를 쓰려면 '방금 이미지로'라고 답해도 좋아요."
-                    _save_assistant_text_dedup(session_id, ask_img)
+                    _spawn_background(_save_assistant_text_dedup, session_id, ask_img)
                     return ChatResponse(reply=ask_img, meta={"need_more_info": True, "session_id": session_id})
 
             # 프롬프트 보강: 없으면 LLM으로 스펙화 후 합성
             if not (payload.get("prompt_en") or payload.get("prompt") or payload.get("prompt_kr")):
-                spec_out = _build_edit_spec(message)
+                spec_out = await asyncio.to_thread(_build_edit_spec, message)
                 spec = spec_out.get("spec") or {}
                 missing = spec_out.get("missing") or []
                 if missing:
                     q = spec_out.get("question") or "원하는 수정을 한 줄로 알려주세요."
-                    _save_assistant_text(session_id, q)
+                    _spawn_background(_save_assistant_text, session_id, q)
                     return ChatResponse(reply=q, meta={"need_more_info": True, "session_id": session_id})
                 final_prompt = _compose_edit_prompt(spec)
                 payload["prompt_en"] = final_prompt
 
         # ADK 에이전트에 JSON 태스크 전달(최우선)
-        import json
-        task_json = json.dumps(payload, ensure_ascii=False)
         try:
             # ADK 토글 및 타임아웃 지원
-            import os
             use_adk = os.getenv("USE_ADK", "true").lower() not in ("0","false","no")
             timeout_s = float(os.getenv("ADK_TIMEOUT", "25"))
             if use_adk:
-                from app.adk import adk_run
-                out = adk_run(task_json, timeout=timeout_s)
+                out = await adk_run_async(_json_dumps(payload), timeout=timeout_s)
             else:
                 raise RuntimeError("ADK disabled by USE_ADK env")
         except Exception as adk_err:
-            logger.warning(f"ADK run failed, falling back to direct tools: {adk_err}")
+            logger.warning("ADK run failed, falling back to direct tools: %s", adk_err)
             # Direct tool call 폴백. 프롬프트 구성/가드.
             raw_prompt = payload.get("prompt_en") or payload.get("prompt") or payload.get("prompt_kr")
             if not raw_prompt or not str(raw_prompt).strip():
                 if task.intent == "edit" and (getattr(task, 'selection_path', None) or getattr(task, 'mask_path', None)):
                     try:
-                        from app.prompts import EDIT_PROMPT_SYSTEM, DEFAULT_EDIT_INSTRUCTION_KR
-                        from openai import OpenAI
-                        import os
-                        openai_key = os.getenv("OPENAI_API_KEY")
-                        if not openai_key:
-                            raise ValueError("OPENAI_API_KEY not found in environment variables")
-                        client = OpenAI(api_key=openai_key)
+                        client = get_openai_client()
                         user_edit_text = (message or DEFAULT_EDIT_INSTRUCTION_KR)
-                        r = client.chat.completions.create(
+                        r = await asyncio.to_thread(client.chat.completions.create,
                             model="gpt-4o-mini",
                             messages=[{"role":"system","content":EDIT_PROMPT_SYSTEM},{"role":"user","content": user_edit_text}],
                             temperature=0.2,max_tokens=120
@@ -930,20 +1154,11 @@ async def orchestrate(message: str,
                 else:
                     raw_prompt = _build_prompt(task)
 
-            if payload.get("intent") == "generate":
-                out = generate_image_tool(prompt=raw_prompt, size=payload.get("size", "1024x1024"))
-            else:
-                out = edit_image_tool(
-                    image_path=payload.get("image_path"),
-                    prompt=raw_prompt,
-                    mask_path=payload.get("mask_path"),
-                    selection_path=payload.get("selection_path"),
-                    size=payload.get("size", "1024x1024")
-                )
+            tool, kwargs = _DIRECT_TOOLS[payload.get("intent") or "edit"](payload, raw_prompt)
+            out = await asyncio.to_thread(tool, **kwargs)
 
         if isinstance(out, dict) and out.get("status") == "ok" and out.get("url"):
             # prompts 기반 내레이션/요약 렌더링
-            from app.prompts import render_image_result
             rendered = render_image_result(task)
             reply = rendered.get("confirm") or rendered.get("reply")
             summary = rendered.get("summary")
@@ -952,20 +1167,18 @@ async def orchestrate(message: str,
             # 온보딩 관련 추가 멘트는 더 이상 붙이지 않음
 
             # ✅ 결과 저장
-            _save_assistant_text(session_id, reply)
-            _save_assistant_image(session_id, out["url"], meta={"task": task.model_dump(), "desc": desc})
+            urls = out.get("urls") or None
+            await asyncio.to_thread(_save_assistant_reply, session_id, reply, out["url"], meta={"task": task, "desc": desc}, urls=urls)
 
-            return ChatResponse(reply=reply, url=out["url"], meta={"summary": summary, "desc": desc, "session_id": session_id})
+            return ChatResponse(reply=reply, url=out["url"], urls=urls, meta={"summary": summary, "desc": desc, "session_id": session_id})
 
         # 실패 처리
         detail = out if isinstance(out, str) else (out.get("detail") if isinstance(out, dict) else "unknown")
         
-        from app.error_handler import ImageGenerationError
         raise ImageGenerationError(f"이미지 작업에 실패했습니다: {detail}")
         
     except Exception as e:
-        logger.error(f"Execution error: {e}")
-        from app.error_handler import ImageGenerationError
+        logger.error("Execution error: %s", e)
         raise ImageGenerationError(f"이미지 작업 중 오류가 발생했습니다: {str(e)}")
 
     # '다시 생성' 요청 간단 처리: 최근 태스크 기반으로 품질 강화 프롬프트 재생성
@@ -980,15 +1193,9 @@ async def orchestrate(message: str,
         if last_task:
             # 영어 프롬프트 재작성
             try:
-                from app.prompts import REGENERATE_PROMPT_SYSTEM
-                from openai import OpenAI
-                import os
-                openai_key = os.getenv("OPENAI_API_KEY")
-                if not openai_key:
-                    raise ValueError("OPENAI_API_KEY not found in environment variables")
-                client = OpenAI(api_key=openai_key)
+                client = get_openai_client()
                 base_prompt = payload.get("prompt_en") or payload.get("prompt") or _build_prompt(last_task)
-                rr = client.chat.completions.create(
+                rr = await asyncio.to_thread(client.chat.completions.create,
                     model="gpt-4o-mini",
                     messages=[{"role":"system","content":REGENERATE_PROMPT_SYSTEM},{"role":"user","content":base_prompt}],
                     temperature=0.4,max_tokens=120
@@ -996,11 +1203,9 @@ async def orchestrate(message: str,
                 refined_prompt = rr.choices[0].message.content.strip() or base_prompt
             except Exception:
                 refined_prompt = _build_prompt(last_task)
-            response = generate_image_tool(prompt=refined_prompt, size=last_task.size if getattr(last_task,'size',None) else "1024x1024")
+            response = await asyncio.to_thread(generate_image_tool, prompt=refined_prompt, size=last_task.size if getattr(last_task,'size',None) else "1024x1024")
             if isinstance(response, dict) and response.get("status") == "ok" and response.get("url"):
-                from app.prompts import render_image_result
                 rendered = render_image_result(last_task)
                 reply = rendered.get("confirm") or "이미지를 다시 생성할게요."
-                _save_assistant_text(session_id, reply)
-                _save_assistant_image(session_id, response["url"], meta={"task": last_task.model_dump() if hasattr(last_task,'model_dump') else {}, "desc": rendered.get("desc")})
+                await asyncio.to_thread(_save_assistant_reply, session_id, reply, response["url"], meta={"task": last_task if hasattr(last_task,'model_dump') else {}, "desc": rendered.get("desc")})
                 return ChatResponse(reply=reply, url=response["url"], meta={"summary": rendered.get("summary"), "desc": rendered.get("desc"), "session_id": session_id})
@@ -1,3 +1,6 @@
+import sys
+from pathlib import Path
+
 # LLM 시스템 프롬프트 (온보딩 포함 버전: 필요 시 다른 경로에서만 사용)
 CHAT_SYSTEM_PROMPT = """
 당신은 "캐럿(Carat)"이다. 한국어로 공손하고 따뜻하게 대화한다.
@@ -213,20 +216,24 @@ def get_general_chat_response(user_name: str = "") -> str:
 
 
 # 이미지 결과 내레이션/요약 생성(디터미니스틱 템플릿)
+# 영문 슬롯 값 → 한글 라벨 (모듈 로드 시 1회 생성)
+_STYLE_KR = {"photo": "실사", "anime": "만화/애니메이션", "illustration": "일러스트", "3d": "3D", "pencil": "연필 스케치", "sketch": "연필 스케치"}
+_MOOD_KR = {"cute": "귀엽고 아기자기한", "brave": "용감한", "calm": "차분한"}
+_OBJ_KR = {"cat": "고양이", "dog": "강아지", "German shepherd": "셰퍼드"}
+
+
 def _kr_style(style: str) -> str:
-    mapping = {"photo": "실사", "anime": "만화/애니메이션", "illustration": "일러스트", "3d": "3D", "pencil": "연필 스케치", "sketch": "연필 스케치"}
-    return mapping.get((style or "illustration"), (style or "일러스트"))
+    return _STYLE_KR.get((style or "illustration"), (style or "일러스트"))
 
 
 def _kr_mood(mood: str, obj_kr: str) -> str:
     if mood:
-        mapping = {"cute": "귀엽고 아기자기한", "brave": "용감한", "calm": "차분한"}
-        return mapping.get(mood, mood)
+        return _MOOD_KR.get(mood, mood)
     return "귀엽고 아기자기한"  # 기본 분위기: 귀엽고 따뜻한 톤
 
 
 def _kr_obj(obj: str) -> str:
-    return {"cat": "고양이", "dog": "강아지", "German shepherd": "셰퍼드"}.get((obj or "이미지"), (obj or "이미지"))
+    return _OBJ_KR.get((obj or "이미지"), (obj or "이미지"))
 
 
 def render_image_result(task) -> dict:
@@ -342,3 +349,16 @@ TITLE_PROMPT_SYSTEM = (
     "- 그대로 베끼지 말고 요약. 개인정보·감탄사 제외.\n"
     "- 출력은 제목 한 줄만.\n"
 )
+
+SUMMARY_PROMPT_SYSTEM = (
+    "당신은 이미지 생성/편집 채팅의 이전 대화를 한국어로 요약합니다.\n"
+    "규칙:\n"
+    "- 기존 요약과 새 대화를 합쳐 5줄 이내로 갱신.\n"
+    "- 사용자가 만든/편집한 대상, 선호 스타일, 미해결 요청 위주로 남기고 인사·잡담은 제외.\n"
+    "- 출력은 요약 본문만.\n"
+)
+
+# ADK 오케스트레이터 에이전트 지시문 (OpenAI 폴백 단계와 공유, 요청별 데이터 삽입 금지)
+ORCHESTRATOR_INSTRUCTION = sys.intern(
+    (Path(__file__).parent / "resources" / "orchestrator_instruction.md").read_text(encoding="utf-8")
+)
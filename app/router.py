@@ -1,9 +1,22 @@
 # app/llm_router.py
+import asyncio
+import functools
+import hashlib
 import os, json
+import re
 from app.settings import settings
+from app.clients import get_async_openai_client, get_chat_client
 from typing import List, Dict, Optional
 from app.schemas import RouterDecision, GenerationTask
 from app.prompts import EDIT_INTENT_SYSTEM
+from app.cache import TTLCache
+
+try:
+    import orjson  # type: ignore
+    _json_loads = orjson.loads
+except Exception:
+    orjson = None
+    _json_loads = json.loads
 
 def _get_openai_key():
     """OpenAI API 키 가져오기"""
@@ -32,6 +45,8 @@ Your job:
            "bg":"park|night street|...",
            "size":"1024x1024|1024x1536|1536x1024",
            "prompt_en":"(English prompt, compact and specific)",
+           "count":"(optional) number of images (2-10) when the user asks for several of the same thing, else null",
+           "prompts":["(optional) one English prompt per image when the user asks for several different images, else null"],
            "image_path":"... (for edit only, else null)",
            "mask_path":"... (optional)"
         }
@@ -43,6 +58,7 @@ Rules:
 - NEVER include any text outside of JSON. Output valid JSON only.
 - Prefer concise values. Set a reasonable default size (1024x1024) when missing.
 - If intent is EDIT, require image_path or mention it in the clarify question.
+- Use count/prompts only for GENERATE and only when the user explicitly asks for more than one image (e.g. "3장", "여러 장", "각각"). Otherwise leave both null.
 - Consider the dialog context (history) when inferring object/style/pose/bg.
 - IMPORTANT: If PENDING_TASK_JSON exists, use it as context and combine with the user's latest response to fill missing slots.
 - If the user is responding to a previous question about style/pose/background, extract the information from their response and create a complete task.
@@ -51,53 +67,72 @@ Rules:
 - CRITICAL: If the user's response doesn't contain any style/pose/background information and seems like a change of topic, return "chat".
 """
 
+# 스타일 키워드 → 정규 스타일. 앞선 규칙이 우선 (pencil/sketch 최우선)
+_STYLE_RULES = (
+    ("pencil", ("pencil", "sketch", "연필", "스케치")),
+    ("anime", ("anime", "cartoon")),
+    ("illustration", ("illustr",)),
+    ("photo", ("photo", "realistic")),
+    ("3d", ("3d",)),
+)
+_STYLE_KEYWORDS = {kw: (rank, style) for rank, (style, kws) in enumerate(_STYLE_RULES) for kw in kws}
+_STYLE_RE = re.compile("|".join(re.escape(kw) for kw in sorted(_STYLE_KEYWORDS, key=len, reverse=True)))
+
+@functools.lru_cache(maxsize=128)
 def normalize_style(s: str) -> str:
     """Normalize style to prevent repeated questions"""
     if not s:
         return "illustration"
     
-    s = s.lower().replace(" ", "").replace("//","/").replace("\\","/")
-    
-    # Pencil / sketch 우선 매핑
-    if ("pencil" in s) or ("sketch" in s) or ("연필" in s) or ("스케치" in s):
-        return "pencil"
-    if "anime" in s or "cartoon" in s:
-        return "anime"
-    if "illustr" in s:
-        return "illustration"
-    if "photo" in s or "realistic" in s:
-        return "photo"
-    if "3d" in s:
-        return "3d"
-    
-    return "illustration"
+    # 한 번의 스캔으로 모든 키워드를 찾고 가장 우선순위가 높은 규칙 채택
+    best = None
+    for m in _STYLE_RE.finditer(s.lower().replace(" ", "")):
+        rank, style = _STYLE_KEYWORDS[m.group()]
+        if best is None or rank < best[0]:
+            best = (rank, style)
+            if rank == 0:
+                break
+    return best[1] if best else "illustration"
+
+# 이전 턴 한 줄 최대 길이 (이미지 메타 등 긴 내용이 프롬프트를 키우지 않도록)
+_HISTORY_LINE_MAX = 500
+
+def _pending_json(pending: GenerationTask) -> str:
+    """펜딩 태스크 JSON (필드가 모두 JSON 기본 타입이라 orjson으로 __dict__를 바로 직렬화, 없으면 pydantic)"""
+    if orjson is not None:
+        return orjson.dumps(pending.__dict__).decode()
+    return pending.model_dump_json()
 
 def _render_history(history: List[Dict[str,str]], last_user: str, pending: Optional[GenerationTask]) -> str:
     lines = []
-    for h in history[-8:]:
-        role = h.get("role","user").upper()
-        txt = (h.get("content","") or "").replace("\n"," ")
-        if txt: 
-            lines.append(f"{role}: {txt}")
-    lines.append(f"USER: {last_user.replace('\n',' ')}")
+    # 롤링 요약은 tail 슬라이스와 무관하게 항상 맨 앞에 유지
+    start = 0
+    if history and history[0].get("role") == "summary":
+        lines.append(f"SUMMARY: {history[0].get('content', '')}")
+        start = 1
+    # 요약 뒤 최근 8턴만 (히스토리 전체를 복사하지 않고 시작 위치만 계산)
+    # 긴 내용(이미지 메타 등)은 먼저 자른 뒤 줄바꿈 치환 → 잘릴 부분까지 훑지 않음 (치환은 길이 불변이라 결과 동일)
+    lines.extend(
+        f"{h.get('role', 'user').upper()}: {txt}"
+        for h in history[max(start, len(history) - 8):]
+        for txt in ((h.get("content", "") or "")[:_HISTORY_LINE_MAX].replace("\n", " "),)
+        if txt
+    )
+    last = last_user.replace("\n", " ")
+    lines.append(f"USER: {last}")
     
     if pending:
         # 펜딩 상태가 있으면 명확히 표시
-        pending_json = pending.model_dump_json()
+        pending_json = _pending_json(pending)
         lines.append(f"PENDING_TASK_JSON: {pending_json}")
         lines.append("NOTE: User is responding to a previous question. Extract style/pose/background from their response and combine with pending task.")
     
     return "\n".join(lines)
 
-def _openai_json_only(payload: str) -> str:
-    from openai import OpenAI
-    openai_key = _get_openai_key()
-    if not openai_key:
-        raise ValueError("OPENAI_API_KEY not found in environment variables")
-    client = OpenAI(api_key=openai_key)
-    
-    # Standard OpenAI chat completions API
-    r = client.chat.completions.create(
+async def _openai_json_only(payload: str) -> str:
+    # Standard OpenAI chat completions API (비동기 SDK: 응답 대기 중 이벤트 루프/스레드를 점유하지 않음)
+    # SYSTEM은 바이트 단위로 고정된 첫 메시지 → 가변 대화는 뒤쪽 user 메시지에만 두어 자동 프롬프트 캐시 프리픽스 유지
+    r = await get_async_openai_client().chat.completions.create(
         model=settings.ROUTER_MODEL,
         messages=[{"role":"system","content":SYSTEM},{"role":"user","content":payload}],
         temperature=0.2,
@@ -106,59 +141,125 @@ def _openai_json_only(payload: str) -> str:
     )
     return r.choices[0].message.content
 
-def _gemini_json_only(payload: str) -> str:
+@functools.lru_cache(maxsize=4)
+def _gemini_model(model_name: str):
+    """모델 이름별 Gemini 모델 객체 (SDK import/configure는 첫 호출 때 1회)"""
     import google.generativeai as genai
-    gemini_key = _get_gemini_key()
-    if not gemini_key:
+    genai.configure(api_key=_get_gemini_key())
+    # 고정 SYSTEM을 system_instruction으로 분리 → 매 요청 동일한 프리픽스라 제공자 측 프롬프트 캐시 적중
+    return genai.GenerativeModel(model_name, system_instruction=SYSTEM)
+
+async def _gemini_json_only(payload: str) -> str:
+    if not _get_gemini_key():
         raise ValueError("GOOGLE_API_KEY not found in environment variables")
-    genai.configure(api_key=gemini_key)
-    model = genai.GenerativeModel(settings.ROUTER_MODEL)
-    resp = model.generate_content(
-        f"{SYSTEM}\n\n=== DIALOG ===\n{payload}\n\nReturn JSON only.",
+    resp = await _gemini_model(settings.ROUTER_MODEL).generate_content_async(
+        f"=== DIALOG ===\n{payload}\n\nReturn JSON only.",
         generation_config={"temperature":0.2,"max_output_tokens":400}
     )
     return resp.text or "{}"
 
-def route_with_llm(history, last_user, pending) -> RouterDecision:
+def classify_edit_intent(user_text: str) -> bool:
+    """직전 이미지 편집 의도 분류 (같은 문장은 캐시 재사용, 실패는 캐시하지 않고 False)"""
+    try:
+        return _classify_edit_intent_cached(user_text or "")
+    except Exception:
+        return False
+
+@functools.lru_cache(maxsize=128)
+def _classify_edit_intent_cached(user_text: str) -> bool:
+    r = get_chat_client().chat.completions.create(
+        model=(settings.AZURE_OPENAI_DEPLOYMENT_CHAT if settings.USE_AZURE_OPENAI else settings.ROUTER_MODEL),
+        messages=[{"role":"system","content":EDIT_INTENT_SYSTEM},{"role":"user","content": user_text}],
+        temperature=0,
+        max_tokens=10,
+        response_format={"type":"json_object"}
+    )
+    data = _json_loads(r.choices[0].message.content)
+    return bool(data.get('edit') is True)
+
+def clear_intent_cache() -> None:
+    """프롬프트/모델 변경 시 편집 의도 캐시 초기화"""
+    _classify_edit_intent_cached.cache_clear()
+
+# 라우터가 채우는 태스크 필드별 허용 타입 (이 범위면 스키마와 일치하므로 검증 생략 가능)
+_TASK_FIELD_TYPES = {
+    name: ((int,) if name == "count" else (list,) if name == "prompts" else (str,))
+    for name in GenerationTask.model_fields
+}
+_TASK_INTENTS = ("generate", "edit")
+
+def _task_value_ok(key: str, value) -> bool:
+    """model_construct로 넘겨도 되는 값인지 (None은 항상 허용)"""
+    if value is None:
+        return True
+    types = _TASK_FIELD_TYPES.get(key)
+    if types is None or not isinstance(value, types):
+        return False
+    if key == "count":
+        return not isinstance(value, bool)  # bool은 int의 하위 타입
+    if key == "prompts":
+        return all(isinstance(p, str) for p in value)
+    return True
+
+def _task_from_llm(raw) -> GenerationTask:
+    """LLM 태스크 JSON → GenerationTask. 키/타입이 스키마대로면 model_construct로 검증 생략, 아니면 전체 검증"""
+    if (settings.ROUTER_STRICT or not isinstance(raw, dict) or raw.get("intent") not in _TASK_INTENTS
+            or not all(_task_value_ok(k, v) for k, v in raw.items())):
+        return GenerationTask.model_validate(raw)
+    # None 값은 빼서 기본값(size 등)이 적용되게 함
+    return GenerationTask.model_construct(**{k: v for k, v in raw.items() if v is not None})
+
+# 라우터 LLM 원문 응답 캐시: 키는 렌더링된 payload 전체(히스토리+사용자 메시지+펜딩 JSON)의 해시라
+# 펜딩 태스크가 있어도 문맥이 완전히 같을 때만 적중. 파싱에 성공한 응답만 저장
+_RAW_CACHE = TTLCache(maxsize=2048, ttl=300)
+
+async def route_with_llm(history, last_user, pending) -> RouterDecision:
     import logging
     logger = logging.getLogger(__name__)
     
     payload = _render_history(history, last_user, pending)
-    logger.info(f"LLM_ROUTER: last_user='{last_user}', pending={pending is not None}, payload_len={len(payload)}")
+    logger.info("LLM_ROUTER: last_user='%s', pending=%s, payload_len=%d", last_user, pending is not None, len(payload))
     
     raw = None
+    cache_key = hashlib.blake2b(payload.encode("utf-8"), digest_size=16).digest()
     
     try:
         openai_key = _get_openai_key()
         gemini_key = _get_gemini_key()
         
-        if openai_key:
+        cached = _RAW_CACHE.get(cache_key)
+        if cached is not None:
+            logger.info("LLM_ROUTER: cache hit")
+            raw = cached
+        elif openai_key:
             logger.info("LLM_ROUTER: Using OpenAI")
-            raw = _openai_json_only(payload)
+            raw = await _openai_json_only(payload)
         elif gemini_key:
             logger.info("LLM_ROUTER: Using Gemini")
-            raw = _gemini_json_only(payload)
+            raw = await _gemini_json_only(payload)
         else:
             logger.warning("LLM_ROUTER: No API keys available")
             # API 키가 없으면 chat으로 라우팅 (LLM이 직접 응답)
             if pending:
-                return RouterDecision(next_action="run", task=pending)  # 펜딩이 있으면 실행
-            return RouterDecision(next_action="chat")
+                return RouterDecision.model_construct(next_action="run", task=pending)  # 펜딩이 있으면 실행
+            return RouterDecision.model_construct(next_action="chat")
         
-        logger.info(f"LLM_ROUTER: raw_response='{raw[:100]}...'")
-        data = json.loads(raw)
-        logger.info(f"LLM_ROUTER: parsed_data={data}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("LLM_ROUTER: raw_response='%s...'", raw[:100])
+        data = _json_loads(raw)
+        logger.debug("LLM_ROUTER: parsed_data=%s", data)
+        _RAW_CACHE.set(cache_key, raw)
     except Exception as e:
         logger.error(f"LLM_ROUTER: Error parsing response: {e}, raw='{raw}'")
         # JSON 파싱 실패 시 chat으로 라우팅 (LLM이 직접 응답)
         if pending:
-            return RouterDecision(next_action="run", task=pending)  # 펜딩이 있으면 실행
-        return RouterDecision(next_action="chat")
+            return RouterDecision.model_construct(next_action="run", task=pending)  # 펜딩이 있으면 실행
+        return RouterDecision.model_construct(next_action="chat")
 
     na = data.get("next_action")
     
     if na == "run" and data.get("task"):
-        t = GenerationTask(**data["task"])
+        t = _task_from_llm(data["task"])
         if not t.size: 
             t.size = "1024x1024"
         
@@ -166,34 +267,19 @@ def route_with_llm(history, last_user, pending) -> RouterDecision:
         if t.style:
             t.style = normalize_style(t.style)
         
-        return RouterDecision(next_action="run", task=t)
+        return RouterDecision.model_construct(next_action="run", task=t)
     
     if na == "ask":
-        return RouterDecision(next_action="ask")
+        return RouterDecision.model_construct(next_action="ask")
     
-    # 추가: 간단 편집 의도 감지(직전 이미지 기반 편집 요청)
-    try:
-        from openai import OpenAI
-        key = _get_openai_key()
-        if key:
-            client = OpenAI(api_key=key)
-            r = client.chat.completions.create(
-                model=settings.ROUTER_MODEL,
-                messages=[{"role":"system","content":EDIT_INTENT_SYSTEM},{"role":"user","content": last_user}],
-                temperature=0,
-                max_tokens=10,
-                response_format={"type":"json_object"}
-            )
-            j = json.loads(r.choices[0].message.content)
-            if j.get("edit") is True and pending:
-                # 직전 펜딩 태스크가 있으면 그대로 편집 실행으로 보냄
-                t = pending
-                if not t.size:
-                    t.size = "1024x1024"
-                if t.style:
-                    t.style = normalize_style(t.style)
-                return RouterDecision(next_action="run", task=t)
-    except Exception:
-        pass
+    # 추가: 간단 편집 의도 감지 — 직전 펜딩 태스크가 있으면 그대로 편집 실행으로 보냄
+    # (오케스트레이터의 chat→edit 전환과 같은 분류기/캐시를 공유해 같은 문장에 LLM을 두 번 부르지 않음)
+    if pending and await asyncio.to_thread(classify_edit_intent, last_user):
+        t = pending
+        if not t.size:
+            t.size = "1024x1024"
+        if t.style:
+            t.style = normalize_style(t.style)
+        return RouterDecision.model_construct(next_action="run", task=t)
 
-    return RouterDecision(next_action="chat")
+    return RouterDecision.model_construct(next_action="chat")
@@ -10,19 +10,17 @@ PROHIBITED_PATTERNS = [
     r"자살", r"자해",
 ]
 
+# 금지 패턴을 하나의 정규식으로 합쳐 입력을 한 번만 훑는다.
+# 패턴은 소문자로만 작성하고 입력을 호출부에서 한 번 소문자화하므로 IGNORECASE(문자별 대소문자 접기)는 쓰지 않음
+_PROHIBITED_RE = re.compile("|".join(f"(?:{pat})" for pat in PROHIBITED_PATTERNS))
+
 
 def detect_prohibited(user_text: str) -> str | None:
     """금지 주제 감지: 폭력/불법 행위 조장·미화 요청 등.
-    금지 시 사유 문자열을 반환, 아니면 None.
+    user_text는 소문자화된 입력을 받는다. 금지 시 사유 문자열을 반환, 아니면 None.
     """
-    text = user_text or ""
-    for pat in PROHIBITED_PATTERNS:
-        try:
-            if re.search(pat, text, re.IGNORECASE):
-                return "폭력·불법 행위를 조장/미화하는 요청"
-        except re.error:
-            # 패턴 에러는 무시
-            continue
+    if _PROHIBITED_RE.search(user_text or ""):
+        return "폭력·불법 행위를 조장/미화하는 요청"
     return None
 
 
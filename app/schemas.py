@@ -28,9 +28,18 @@ class OrchestratorResult(BaseModel):
     filename: Optional[str] = None
     detail: Optional[str] = None  # ← 로깅 충돌 방지(message 금지)
 
+class TaskResponse(BaseModel):
+    """ADK/폴백 실행 결과 (에이전트 JSON 출력 검증용)"""
+    status: Literal["ok", "error"]
+    url: Optional[str] = None
+    urls: Optional[List[str]] = None
+    detail: Optional[str] = None
+    errors: Optional[List[str]] = None  # 여러 장 생성 중 일부 실패한 항목의 사유
+
 class ChatResponse(BaseModel):
     reply: Optional[str] = None
     url: Optional[str] = None
+    urls: Optional[List[str]] = None  # 여러 장 생성 시 전체 이미지 (url은 첫 장)
     meta: Optional[Dict] = None
 
 # 새로운 GenerationTask 스키마 (필수 슬롯 정의)
@@ -43,6 +52,8 @@ class GenerationTask(BaseModel):
     bg: Optional[str] = None
     size: str = "1024x1024"
     prompt_en: Optional[str] = None
+    prompts: Optional[List[str]] = None  # 여러 장 생성 시 프롬프트 목록 (최대 10)
+    count: Optional[int] = None          # 같은 프롬프트로 N장 생성
     image_path: Optional[str] = None
     mask_path: Optional[str] = None
     selection_path: Optional[str] = None
@@ -2,6 +2,7 @@ import logging
 from typing import Dict, Optional
 from datetime import datetime
 from dataclasses import dataclass, asdict
+from app.cache import TTLCache
 from app.database import get_messages_by_session, get_onboarding_state
 
 logger = logging.getLogger(__name__)
@@ -12,6 +13,8 @@ class SessionContext:
     session_id: str
     user_name: Optional[str] = None
     is_onboarded: bool = False
+    # 인사(GREETING)를 이미 보냈는지 — 이름을 받기 전이라도 True면 온보딩 DB 상태 조회를 생략
+    greeted: bool = False
     asked_once: bool = False
     pending_task: Optional[Dict] = None
     created_at: datetime = None
@@ -27,21 +30,23 @@ class SessionContext:
         """온보딩 완료 표시"""
         self.user_name = user_name
         self.is_onboarded = True
+        self.greeted = True
         self.updated_at = datetime.utcnow()
-        logger.info(f"Session {self.session_id} onboarded for user {user_name}")
+        logger.info("Session %s onboarded for user %s", self.session_id, user_name)
     
     def set_pending_task(self, task: Dict):
         """펜딩 태스크 설정"""
         self.pending_task = task
         self.asked_once = True
         self.updated_at = datetime.utcnow()
-        logger.info(f"Session {self.session_id} pending task set: {task}")
+        logger.info("Session %s pending task set", self.session_id)
+        logger.debug("Session %s pending task: %s", self.session_id, task)
     
     def clear_pending_task(self):
         """펜딩 태스크 제거"""
         self.pending_task = None
         self.updated_at = datetime.utcnow()
-        logger.info(f"Session {self.session_id} pending task cleared")
+        logger.info("Session %s pending task cleared", self.session_id)
     
     def to_dict(self) -> Dict:
         """딕셔너리로 변환"""
@@ -50,12 +55,17 @@ class SessionContext:
 class SessionManager:
     """세션 관리자 - 단일 진실 소스"""
     
+    # 돌아오지 않는 세션이 무한히 쌓이지 않도록 크기/유휴 시간 제한 (온보딩 상태는 DB에서 복원됨)
+    MAX_SESSIONS = 10000
+    SESSION_TTL = 600.0
+
     def __init__(self):
-        self._sessions: Dict[str, SessionContext] = {}
+        self._sessions = TTLCache(maxsize=self.MAX_SESSIONS, ttl=self.SESSION_TTL)
     
     def get_session(self, session_id: str) -> SessionContext:
-        """세션 가져오기 (없으면 생성)"""
-        if session_id not in self._sessions:
+        """세션 가져오기 (없으면 생성, 접근할 때마다 만료 시간 연장)"""
+        ctx = self._sessions.get(session_id)
+        if ctx is None:
             # DB 라치 반영하여 초기화
             try:
                 state = get_onboarding_state(session_id)
@@ -63,13 +73,16 @@ class SessionManager:
                     session_id=session_id,
                     user_name=state.get("user_name") if isinstance(state, dict) else None,
                     is_onboarded=bool(state.get("greeted")) if isinstance(state, dict) else False,
+                    greeted=bool(state.get("greeted")) if isinstance(state, dict) else False,
                     asked_once=bool(state.get("asked_once")) if isinstance(state, dict) else False,
                 )
             except Exception:
                 ctx = SessionContext(session_id=session_id)
-            self._sessions[session_id] = ctx
-            logger.info(f"New session created: {session_id}")
-        return self._sessions[session_id]
+            logger.info("New session created: %s", session_id)
+        # 70% 이상 찼으면 유휴 만료를 절반으로 줄여 빨리 비움
+        ttl = self.SESSION_TTL / 2 if len(self._sessions) > self.MAX_SESSIONS * 0.7 else None
+        self._sessions.set(session_id, ctx, ttl=ttl)
+        return ctx
     
     def update_session(self, session_id: str, **kwargs):
         """세션 업데이트"""
@@ -78,12 +91,12 @@ class SessionManager:
             if hasattr(session, key):
                 setattr(session, key, value)
         session.updated_at = datetime.utcnow()
-        logger.info(f"Session {session_id} updated: {kwargs}")
+        logger.debug("Session %s updated: %s", session_id, kwargs)
     
-    def get_history(self, session_id: str) -> list:
-        """세션 히스토리 가져오기"""
+    def get_history(self, session_id: str, limit: int = 16) -> list:
+        """세션 히스토리 가져오기 (최근 limit개)"""
         try:
-            return get_messages_by_session(session_id) or []
+            return get_messages_by_session(session_id, limit=limit) or []
         except Exception as e:
             logger.error(f"Failed to get history for session {session_id}: {e}")
             return []
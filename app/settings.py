@@ -9,6 +9,10 @@ class Settings:
     GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY") or os.getenv("GEMINI_API_KEY") or ""
     ROUTER_MODEL = os.getenv("ROUTER_MODEL", "gpt-4o-mini")
     ADK_MODEL = os.getenv("ADK_MODEL", "gemini-2.0-flash-8b")
+    # 편집 의도 분류 LLM 대기 한도(초). 초과 시 일반 대화로 진행하고 결과는 캐시에만 남김
+    EDIT_INTENT_TIMEOUT = float(os.getenv("EDIT_INTENT_TIMEOUT", "1.5"))
+    # 라우터 LLM 출력의 GenerationTask를 항상 전체 검증(디버깅용). 기본은 가벼운 타입 확인 후 검증 생략
+    ROUTER_STRICT = os.getenv("ROUTER_STRICT", "false").lower() not in ("0", "false", "no")
     FRONT_ORIGIN = os.getenv("FRONT_ORIGIN", "http://localhost:5173")
     # Azure OpenAI
     USE_AZURE_OPENAI = os.getenv("USE_AZURE_OPENAI", "false").lower() not in ("0", "false", "no")
@@ -1,30 +1,61 @@
 import os
 import base64
+import threading
+import time
 import uuid
 import requests
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional, Dict, List
 from fastapi import UploadFile
 from PIL import Image
 import numpy as np
 from urllib.parse import urlparse
 
-from openai import OpenAI, AzureOpenAI
 from app.settings import settings
+from app.clients import get_chat_client
+from app.http import CLIENT
 
 def _get_client():
-    """OpenAI or Azure OpenAI 클라이언트 반환"""
+    """OpenAI or Azure OpenAI 클라이언트 반환 (설정 검증 후 채팅 호출과 같은 공용 클라이언트·커넥션 풀 사용)"""
     if settings.USE_AZURE_OPENAI:
         if not (settings.AZURE_OPENAI_API_KEY and settings.AZURE_OPENAI_ENDPOINT and settings.AZURE_OPENAI_API_VERSION):
             raise ValueError("Azure OpenAI 설정이 부족합니다.")
-        return AzureOpenAI(
-            api_key=settings.AZURE_OPENAI_API_KEY,
-            api_version=settings.AZURE_OPENAI_API_VERSION,
-            azure_endpoint=settings.AZURE_OPENAI_ENDPOINT,
-        )
-    key = (settings.OPENAI_API_KEY or "").strip()
-    if not key or key.startswith("your-api"):
-        raise ValueError("OPENAI_API_KEY가 비어있거나 placeholder입니다.")
-    return OpenAI(api_key=key)
+    else:
+        key = settings.OPENAI_API_KEY
+        if not key or key.startswith("your-api"):
+            raise ValueError("OPENAI_API_KEY가 비어있거나 placeholder입니다.")
+    return get_chat_client()
+
+# 워밍 최소 간격(초): 유휴 keep-alive 커넥션이 살아 있는 동안은 다시 열 필요 없음
+_WARM_INTERVAL = 30.0
+_WARM_LOCK = threading.Lock()
+_last_warm = 0.0
+
+# 편집은 SDK가 아니라 공용 requests 세션으로 REST 호출
+_OPENAI_API_BASE = "https://api.openai.com/v1/"
+_IMAGES_EDIT_URL = _OPENAI_API_BASE + "images/edits"
+
+def warm_image_client() -> None:
+    """이미지 툴 커넥션(생성용 SDK 풀 + 편집용 requests 세션)을 미리 열어 둔다 (라우터 대기 중 호출, 실패는 무시)"""
+    global _last_warm
+    with _WARM_LOCK:
+        now = time.monotonic()
+        if now - _last_warm < _WARM_INTERVAL:
+            return
+        _last_warm = now
+    # API 호출 없이 HEAD로 TLS 커넥션만 열어 keep-alive 풀에 남김 (응답 코드는 무관)
+    try:
+        client = _get_client()
+        http = getattr(client, "_client", None)  # SDK의 httpx 클라이언트 (공개 접근자가 없어 방어적으로 조회)
+        if http is not None:
+            http.head(str(client.base_url), timeout=3.0)
+    except Exception:
+        pass
+    if settings.OPENAI_API_KEY:
+        try:
+            CLIENT.head(_OPENAI_API_BASE, timeout=3.0)
+        except Exception:
+            pass
 
 OUT_DIR = os.path.join(os.path.dirname(__file__), "static", "outputs")
 os.makedirs(OUT_DIR, exist_ok=True)
@@ -38,12 +69,12 @@ def _save_b64_png(b64: str) -> str:
     with open(path, "wb") as f: f.write(data)
     return f"/static/outputs/{name}"
 
-def _save_url_png(url: str) -> str:
+def _save_url_png(url: str, client: requests.Session = CLIENT) -> str:
     if not url:
         raise ValueError("이미지 URL이 없습니다.")
     name = f"{uuid.uuid4().hex}.png"
     path = os.path.join(OUT_DIR, name)
-    r = requests.get(url, timeout=30)
+    r = client.get(url, timeout=30)
     r.raise_for_status()
     with open(path, "wb") as f:
         f.write(r.content)
@@ -120,6 +151,25 @@ def generate_image_tool(prompt: str, size: str="1024x1024"):
     except Exception as e:
         return {"status": "error", "detail": str(e)}
 
+MAX_BATCH_IMAGES = 10
+
+
+def generate_images_batch_tool(prompts: List[str], size: str = "1024x1024") -> Dict:
+    """여러 프롬프트를 한 번에 생성 (DALL·E 3는 n=1만 지원하므로 요청을 동시에 보낸다)"""
+    prompts = [p for p in (prompts or []) if p and str(p).strip()][:MAX_BATCH_IMAGES]
+    if not prompts:
+        return {"status": "error", "detail": "이미지 프롬프트가 비어 있습니다."}
+    with ThreadPoolExecutor(max_workers=min(4, len(prompts))) as pool:
+        results = list(pool.map(lambda p: generate_image_tool(prompt=p, size=size), prompts))
+    urls = [r["url"] for r in results if r.get("status") == "ok" and r.get("url")]
+    if not urls:
+        return {"status": "error", "detail": results[0].get("detail", "batch failed")}
+    out = {"status": "ok", "url": urls[0], "urls": urls}
+    errors = [r.get("detail") for r in results if r.get("status") != "ok"]
+    if errors:
+        out["errors"] = errors
+    return out
+
 def _resolve_abs_path(p: Optional[str]) -> Optional[str]:
     if not p:
         return None
@@ -146,11 +196,11 @@ def _resolve_abs_path(p: Optional[str]) -> Optional[str]:
             return alt
     return abs_path
 
-def _images_edit_rest(image_abs: str, mask_abs: Optional[str], prompt: str, size: str, model: str = "dall-e-2") -> Dict[str, str]:
+def _images_edit_rest(image_abs: str, mask_abs: Optional[str], prompt: str, size: str, model: str = "dall-e-2", client: requests.Session = CLIENT) -> Dict[str, str]:
     key = (settings.OPENAI_API_KEY or "").strip()
     if not key:
         return {"status":"error","detail":"OPENAI_API_KEY missing"}
-    url = "https://api.openai.com/v1/images/edits"
+    url = _IMAGES_EDIT_URL
     headers = {"Authorization": f"Bearer {key}"}
     # Ensure PNG format for both image and mask (DALL·E 2 requirement)
     def _ensure_png(abs_path: str) -> str:
@@ -181,7 +231,7 @@ def _images_edit_rest(image_abs: str, mask_abs: Optional[str], prompt: str, size
         "size": size
     }
     try:
-        resp = requests.post(url, headers=headers, files=files, data=data, timeout=90)
+        resp = client.post(url, headers=headers, files=files, data=data, timeout=90)
         j = resp.json()
         if resp.status_code >= 400:
             return {"status":"error","detail": j.get("error",{}).get("message", f"HTTP {resp.status_code}")}
@@ -192,7 +242,7 @@ def _images_edit_rest(image_abs: str, mask_abs: Optional[str], prompt: str, size
             return {"status":"ok","url": out_url}
         url_field = first.get("url")
         if url_field:
-            out_url = _save_url_png(url_field)
+            out_url = _save_url_png(url_field, client)
             return {"status":"ok","url": out_url}
         return {"status":"error","detail":"No image payload in response"}
     except Exception as e: